@@ -1,10 +1,9 @@
-import json
-import os
 import queue
 import threading
 
 from loguru import logger
 
+from config import load_config_with_defaults
 from transcription import record_and_transcribe
 
 
@@ -23,44 +22,6 @@ class ResultThread(threading.Thread):
         self.stop_transcription = True
 
 
-def load_config_with_defaults():
-    default_config = {
-        "use_api": True,
-        "api_options": {
-            "model": "whisper-1",
-            "language": None,
-            "temperature": 0.0,
-            "initial_prompt": None,
-        },
-        "local_model_options": {
-            "model": "base",
-            "device": None,
-            "language": None,
-            "temperature": 0.0,
-            "initial_prompt": None,
-            "condition_on_previous_text": True,
-            "verbose": False,
-        },
-        "activation_key": "ctrl+alt+space",
-        "silence_duration": 900,
-        "writing_key_press_delay": 0.008,
-        "remove_trailing_period": True,
-        "add_trailing_space": False,
-        "remove_capitalization": False,
-        "print_to_terminal": True,
-    }
-
-    config_path = os.path.join("src", "config.json")
-    if os.path.isfile(config_path):
-        with open(config_path, "r") as config_file:
-            user_config = json.load(config_file)
-            for key, value in user_config.items():
-                if key in default_config and value is not None:
-                    default_config[key] = value
-
-    return default_config
-
-
 def clear_status_queue():
     while not status_queue.empty():
         try:
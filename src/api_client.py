@@ -0,0 +1,109 @@
+import os
+import random
+import threading
+import time
+
+from loguru import logger
+
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+# Rate limiting and server-side failures are worth another try; other errors are not
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class APIError(RuntimeError):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class TranscriptionClient:
+    """
+    Posts audio to the OpenAI transcription endpoint (or anything that mimics it, like
+    src/mock_api.py) over one pooled HTTP session.
+
+    The session keeps its connections alive between dictations, so only the first upload pays for
+    the TCP and TLS handshakes. Every request has a timeout, and timeouts, connection errors and
+    retryable statuses are retried with full-jitter exponential backoff.
+    """
+
+    def __init__(self, api_base=None, api_key=None, request_timeout=30, max_retries=2):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.api_base = (api_base or os.getenv("OPENAI_API_BASE") or DEFAULT_API_BASE).rstrip("/")
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        # Retries are handled here with backoff, not by urllib3
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if self.api_key:
+            self.session.headers["Authorization"] = f"Bearer {self.api_key}"
+
+    def warm_up(self):
+        """Open a connection ahead of the first upload. Any response, even an error, will do."""
+        import requests
+
+        try:
+            self.session.head(self.api_base, timeout=self.request_timeout)
+        except requests.RequestException as e:
+            logger.debug(f"Could not connect to {self.api_base} ahead of time: {e}")
+
+    def transcribe(self, file, cancel=None, **fields):
+        """
+        Upload a named file object and return the transcribed text. Once the optional cancel event
+        is set, no further attempts are made.
+        """
+        import requests
+
+        data = {key: value for key, value in fields.items() if value is not None}
+        for attempt in range(self.max_retries + 1):
+            if cancel is not None and cancel.is_set():
+                raise APIError("Transcription request cancelled")
+            file.seek(0)
+            try:
+                response = self.session.post(
+                    f"{self.api_base}/audio/transcriptions",
+                    data=data,
+                    files={"file": (file.name, file, "application/octet-stream")},
+                    timeout=self.request_timeout,
+                )
+                if response.status_code < 400:
+                    return response.json().get("text")
+                error = APIError(
+                    f"Transcription request failed with {response.status_code}: {response.text}",
+                    response.status_code,
+                )
+                if response.status_code not in RETRY_STATUSES:
+                    raise error
+            except requests.RequestException as e:
+                error = APIError(f"Transcription request failed: {e}")
+                error.__cause__ = e
+
+            if attempt == self.max_retries:
+                raise error
+            delay = random.uniform(0, 0.25 * 2**attempt)
+            logger.warning(f"{error}; retrying in {delay:.2f}s")
+            if cancel is not None:
+                cancel.wait(delay)
+            else:
+                time.sleep(delay)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(options):
+    """A client shared by every request with the same API options, so its connections are reused."""
+    key = (options["api_base"], options["request_timeout"], options["max_retries"])
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = TranscriptionClient(
+                api_base=options["api_base"],
+                request_timeout=options["request_timeout"],
+                max_retries=options["max_retries"],
+            )
+        return _clients[key]
@@ -0,0 +1,89 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from loguru import logger
+
+
+class BatchScheduler:
+    """
+    Groups utterances that arrive close together into one batch for the engine.
+
+    The first pending utterance waits at most max_wait seconds for others to join it (or until
+    max_batch_size are pending), so no request pays more than max_wait for batching. The batch
+    goes through engine.transcribe_batch and each caller's future gets its own text back.
+    """
+
+    def __init__(self, engine, max_batch_size=8, max_wait=0.05, sample_rate=16000):
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.sample_rate = sample_rate
+        self._pending = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+        self.batches = 0
+        self.utterances = 0
+
+    @classmethod
+    def from_config(cls, engine, config):
+        options = config["batching"]
+        return cls(
+            engine,
+            max_batch_size=options["max_batch_size"],
+            max_wait=options["max_wait"] / 1000,
+        )
+
+    def submit(self, audio_data):
+        """Queue int16 samples for transcription and return a Future for the text."""
+        future = Future()
+        self._pending.put((audio_data, future))
+        return future
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "utterances": self.utterances,
+            "mean_batch_size": self.utterances / self.batches if self.batches else 0.0,
+        }
+
+    def _collect(self):
+        batch = [self._pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Callers that gave up don't need their utterance transcribed
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                texts = self.engine.transcribe_batch(
+                    [audio for audio, _ in batch], self.sample_rate
+                )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.utterances += len(batch)
+            logger.debug(
+                f"Transcribed a batch of {len(batch)} in {time.perf_counter() - start:.2f}s"
+            )
+            for (_, future), text in zip(batch, texts):
+                future.set_result(text)
@@ -0,0 +1,106 @@
+"""
+Measure how long WhisperWriter takes to start.
+
+Prints the modules that dominate `python -X importtime` for the transcription module, and the
+wall clock time from launching main.py until it prints "Script activated". Run it from the
+repository root:
+
+    python src/bench_startup.py --top 15
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_times(module):
+    """Return {package: cumulative seconds} for the packages imported directly by `module`."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    # A module is reported after all of its imports, with each nesting level indented by two
+    # more spaces, so the module's direct imports are the lines one level deeper than it that
+    # come after the previous top-level import
+    totals = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative_us, indent, name = match.groups()
+        if len(indent) == 1:
+            if name == module:
+                return totals
+            totals = {}
+        elif len(indent) == 3:
+            package = name.split(".")[0]
+            totals[package] = totals.get(package, 0.0) + int(cumulative_us) / 1e6
+    return totals
+
+
+def time_to_activation(timeout=120):
+    """Launch main.py and return the seconds until it prints "Script activated"."""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join("src", "main.py")],
+        cwd=os.path.dirname(SRC_DIR),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        env={**os.environ, "PYTHONUNBUFFERED": "1"},
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            line = process.stdout.readline()
+            if not line:
+                raise RuntimeError(f"main.py exited with code {process.wait()}")
+            if "Script activated" in line:
+                return time.perf_counter() - start
+        raise TimeoutError("main.py did not activate in time")
+    finally:
+        process.kill()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="transcription", help="module to import")
+    parser.add_argument("--top", type=int, default=10, help="number of packages to show")
+    parser.add_argument("--skip-activation", action="store_true", help="don't launch main.py")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    totals = import_times(args.module)
+    results = {
+        "module": args.module,
+        "import_seconds": sum(totals.values()),
+        "imports": dict(sorted(totals.items(), key=lambda item: -item[1])[: args.top]),
+    }
+    if not args.skip_activation:
+        results["activation_seconds"] = time_to_activation()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"import {args.module}: {results['import_seconds'] * 1000:.1f} ms")
+    for package, seconds in results["imports"].items():
+        print(f"  {package:<24} {seconds * 1000:8.1f} ms")
+    if "activation_seconds" in results:
+        print(f'Launch to "Script activated": {results["activation_seconds"] * 1000:.1f} ms')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+Offline end-to-end latency benchmark.
+
+Replays a folder of WAV files through record_and_transcribe in place of the microphone and
+reports, per engine and model: the time from the end of speech to the returned text, the
+real-time factor, the CPU used while capturing, the peak RSS and the VAD endpoint delay, and
+the word error rate for files with a reference transcript next to them (same name, .txt).
+A journal directory (see journal.py) can be given instead of WAV files, to replay the recorded
+dictations; their word error rate is measured against the text they were journaled with.
+Run it from the repository root:
+
+    python src/benchmark.py benchmarks/corpus --engine faster-whisper --output bench.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import re
+import resource
+import subprocess
+import sys
+import threading
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+# Frame RMS (int16) below which the end of a file counts as silence, for the speech end time
+SILENCE_RMS = 300
+# Give up on a file if the VAD hasn't ended the recording this long after the file ran out
+TRAILING_SILENCE_SECONDS = 10
+
+
+class FakeInputStream:
+    """
+    Stand-in for sounddevice.InputStream that feeds samples to the callback at the pace of a
+    real device (or `speed` times faster), followed by silence until the stream is closed.
+    """
+
+    def __init__(self, samples, speed=1.0, **stream_options):
+        self.samples = samples
+        self.speed = speed
+        self.sample_rate = stream_options["samplerate"]
+        self.blocksize = stream_options["blocksize"]
+        self.callback = stream_options["callback"]
+        self.speech_end = speech_end_sample(samples, self.sample_rate)
+
+        self.started_at = None
+        self.speech_ended_at = None
+        self.closed_at = None
+        self.cpu_seconds = None
+        self.exhausted = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        # The recording loop leaves the stream as soon as it detects the endpoint
+        self.closed_at = time.perf_counter()
+        self.cpu_seconds = time.process_time() - self._cpu_start
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        block_seconds = self.blocksize / self.sample_rate / self.speed
+        silence = np.zeros((self.blocksize, 1), dtype=np.int16)
+        position = 0
+        next_block = time.perf_counter()
+        while not self._stop.is_set():
+            block = self.samples[position : position + self.blocksize]
+            if len(block) < self.blocksize:
+                indata = silence.copy()
+                indata[: len(block), 0] = block
+            else:
+                indata = block.reshape(-1, 1)
+            position += self.blocksize
+            if position >= len(self.samples) + TRAILING_SILENCE_SECONDS * self.sample_rate:
+                self.exhausted = True
+            if self.speech_ended_at is None and position >= self.speech_end:
+                self.speech_ended_at = time.perf_counter()
+            self.callback(indata, self.blocksize, None, None)
+
+            next_block += block_seconds
+            self._stop.wait(max(0.0, next_block - time.perf_counter()))
+
+
+def speech_end_sample(samples, sample_rate, frame_duration=30):
+    """Index just past the last 30ms frame whose RMS is above SILENCE_RMS."""
+    frame_size = sample_rate * frame_duration // 1000
+    num_frames = len(samples) // frame_size
+    if num_frames == 0:
+        return len(samples)
+    frames = samples[: num_frames * frame_size].reshape(num_frames, frame_size).astype(np.float32)
+    loud = np.flatnonzero(np.sqrt((frames**2).mean(axis=1)) > SILENCE_RMS)
+    return (loud[-1] + 1) * frame_size if len(loud) else len(samples)
+
+
+def read_wav(path):
+    with wave.open(str(path), "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        # Keep the first channel of multi-channel files
+        samples = samples[:: wf.getnchannels()]
+        return samples, wf.getframerate()
+
+
+def find_corpus(paths):
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.rglob("*.wav")) if path.is_dir() else [path])
+    return files
+
+
+def load_corpus(paths):
+    """
+    Items to replay from paths: (path, None) for each WAV file, and (directory, index) for each
+    recording in a journal directory.
+    """
+    from journal import INDEX_FILE, UtteranceJournal
+
+    items = []
+    for path in map(Path, paths):
+        if (path / INDEX_FILE).is_file():
+            entries = UtteranceJournal(str(path)).entries()
+            items.extend((str(path), index) for index in range(len(entries)))
+        else:
+            items.extend((str(file), None) for file in find_corpus([path]))
+    return items
+
+
+def read_item(item, journals):
+    """
+    The name, samples, sample rate and reference transcript (or None) of a corpus item. Journal
+    recordings are memory-mapped from their segment file; journals caches the open journals.
+    """
+    from journal import UtteranceJournal
+
+    path, index = item
+    if index is None:
+        samples, sample_rate = read_wav(path)
+        reference = Path(path).with_suffix(".txt")
+        return path, samples, sample_rate, reference.read_text() if reference.is_file() else None
+    if path not in journals:
+        journal = UtteranceJournal(path)
+        journals[path] = journal, journal.entries()
+    journal, entries = journals[path]
+    entry = entries[index]
+    return f"{path}#{index}", journal.read(entry), entry["sample_rate"], entry["text"]
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def summarize(runs, key):
+    values = [run[key] for run in runs if run.get(key) is not None]
+    return {
+        "mean": float(np.mean(values)) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "max": max(values) if values else None,
+    }
+
+
+def normalize_words(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance between the texts, divided by the number of reference words."""
+    reference, hypothesis = normalize_words(reference), normalize_words(hypothesis)
+    previous = list(range(len(hypothesis) + 1))
+    for i, word in enumerate(reference, 1):
+        current = [i]
+        for j, other in enumerate(hypothesis, 1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (word != other))
+            )
+        previous = current
+    return previous[-1] / len(reference) if reference else float(bool(hypothesis))
+
+
+def benchmark_engine(engine, preset, items, speed, overrides):
+    """
+    Run every file through one engine, given as "engine[:model]". Called in a fresh process so
+    peak RSS is per engine.
+    """
+    from config import load_tool_config
+    from engines import get_engine
+    from transcription import record_and_transcribe
+
+    config = load_tool_config(overrides, engine, preset)
+    config["print_to_terminal"] = False
+    # Replaying the same files would otherwise measure cache lookups, not the engine
+    config["result_cache"]["enabled"] = False
+    # Nor should replayed recordings be journaled again
+    config["journal"]["enabled"] = False
+    engine_options = config[get_engine(config).options_key]
+
+    load_start = time.perf_counter()
+    get_engine(config).preload()
+    load_seconds = time.perf_counter() - load_start
+
+    runs = []
+    journals = {}
+    for item in items:
+        name, samples, sample_rate, reference = read_item(item, journals)
+        if sample_rate != 16000:
+            raise ValueError(f"{name}: expected 16 kHz audio, got {sample_rate} Hz")
+
+        streams = []
+
+        def input_stream(**stream_options):
+            streams.append(FakeInputStream(samples, speed=speed, **stream_options))
+            return streams[-1]
+
+        text = record_and_transcribe(
+            queue.Queue(),
+            lambda: bool(streams) and streams[0].exhausted,
+            config=config,
+            input_stream=input_stream,
+        )
+        finished_at = time.perf_counter()
+
+        stream = streams[0]
+        if stream.exhausted:
+            runs.append({"file": name, "error": "no endpoint detected"})
+            continue
+        speech_ended_at = stream.speech_ended_at or stream.closed_at
+        capture_seconds = stream.closed_at - stream.started_at
+        inference_seconds = finished_at - stream.closed_at
+        audio_seconds = stream.speech_end / sample_rate
+        runs.append(
+            {
+                "file": name,
+                "audio_seconds": audio_seconds,
+                "text": text,
+                "latency_seconds": finished_at - speech_ended_at,
+                "endpoint_delay_seconds": stream.closed_at - speech_ended_at,
+                "inference_seconds": inference_seconds,
+                "real_time_factor": inference_seconds / audio_seconds if audio_seconds else None,
+                "capture_cpu_percent": 100 * stream.cpu_seconds / capture_seconds,
+            }
+        )
+        if reference is not None:
+            runs[-1]["word_error_rate"] = word_error_rate(reference, text or "")
+
+    return {
+        "engine": get_engine(config).name,
+        "model": engine_options.get("model"),
+        "preset": engine_options.get("preset"),
+        "load_seconds": load_seconds,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "summary": {
+            key: summarize(runs, key)
+            for key in (
+                "latency_seconds",
+                "endpoint_delay_seconds",
+                "real_time_factor",
+                "capture_cpu_percent",
+                "word_error_rate",
+            )
+        },
+        "runs": runs,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "corpus", nargs="+", help="WAV files, folders of WAV files or journal directories"
+    )
+    parser.add_argument(
+        "--engine",
+        action="append",
+        help="engine[:model] to benchmark; may be repeated (default: the configured engine)",
+    )
+    parser.add_argument(
+        "--preset",
+        action="append",
+        help="decoding preset to benchmark each engine with; may be repeated",
+    )
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed multiplier")
+    parser.add_argument("--config", help="JSON object of config values to override")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    items = load_corpus(args.corpus)
+    if not items:
+        parser.error("no WAV files or journal recordings found")
+    overrides = json.loads(args.config) if args.config else {}
+
+    if not args.engine:
+        from config import load_tool_config
+        from engines import engine_name
+
+        args.engine = [engine_name(load_tool_config(overrides))]
+
+    results = []
+    for engine in args.engine:
+        for preset in args.preset or [None]:
+            # A fresh process per run keeps the peak RSS and the model cache separate
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                results.append(
+                    pool.submit(
+                        benchmark_engine,
+                        engine,
+                        preset,
+                        items,
+                        args.speed,
+                        overrides,
+                    ).result()
+                )
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": sys.version.split()[0],
+        },
+        "speed": args.speed,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
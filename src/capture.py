@@ -0,0 +1,190 @@
+import threading
+
+import numpy as np
+
+from resample import PolyphaseResampler
+
+
+class RingBuffer:
+    """
+    Fixed-size int16 ring buffer. The audio callback writes into it in place and a single
+    consumer blocks in read_frames() until enough samples are available.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.int16)
+        # Both positions count samples since the buffer was created, so they only grow
+        self._write_pos = 0
+        self._read_pos = 0
+        self._cond = threading.Condition()
+        self.overruns = 0
+
+    def write(self, samples):
+        n = len(samples)
+        if n > self.capacity:
+            samples = samples[-self.capacity :]
+            n = self.capacity
+
+        with self._cond:
+            start = self._write_pos % self.capacity
+            first = min(n, self.capacity - start)
+            self._data[start : start + first] = samples[:first]
+            self._data[: n - first] = samples[first:]
+            self._write_pos += n
+
+            # The consumer fell behind by more than the whole buffer: drop the oldest audio
+            if self._write_pos - self._read_pos > self.capacity:
+                self.overruns += self._write_pos - self._read_pos - self.capacity
+                self._read_pos = self._write_pos - self.capacity
+
+            self._cond.notify()
+
+    def read_frames(self, frame_size, max_frames, timeout=None):
+        """
+        Block until at least one frame is available and return every whole frame that is (up to
+        max_frames) as a (frames, frame_size) array, so a consumer that fell behind catches up in
+        one call. Returns None if the timeout expires first.
+        """
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: self._write_pos - self._read_pos >= frame_size, timeout
+            )
+            available = self._write_pos - self._read_pos
+            if not ready:
+                return None
+            num_frames = min(available // frame_size, max_frames)
+            return self._take(num_frames * frame_size).reshape(num_frames, frame_size)
+
+    def _take(self, n):
+        # Caller holds self._cond and has checked that n samples are available
+        out = np.empty(n, dtype=np.int16)
+        start = self._read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self._data[start : start + first]
+        out[first:] = self._data[: n - first]
+        self._read_pos += n
+        return out
+
+    def seek_latest(self, n=0):
+        """Skip everything but the newest n samples, e.g. to start a session with some pre-roll."""
+        with self._cond:
+            self._read_pos = max(self._read_pos, self._write_pos - n)
+            # Samples overwritten while nobody was reading weren't lost by anyone
+            self.overruns = 0
+
+
+class SampleBuffer:
+    """Growable int16 array for the recorded utterance; costs 2 bytes per sample."""
+
+    def __init__(self, initial_capacity=16000 * 10):
+        self._data = np.empty(initial_capacity, dtype=np.int16)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def extend(self, samples):
+        end = self._size + len(samples)
+        if end > len(self._data):
+            grown = np.empty(max(end, 2 * len(self._data)), dtype=np.int16)
+            grown[: self._size] = self._data[: self._size]
+            self._data = grown
+        self._data[self._size : end] = samples
+        self._size = end
+
+    def view(self):
+        return self._data[: self._size]
+
+    def drop_front(self, n):
+        """Forget the first n samples, e.g. once they have been transcribed."""
+        remaining = self._size - n
+        self._data[:remaining] = self._data[n : self._size]
+        self._size = remaining
+
+
+def device_sample_rate(configured=None):
+    """The rate to open the input device at: the configured one, or the device's own rate."""
+    if configured:
+        return int(configured)
+    import sounddevice as sd
+
+    return int(sd.query_devices(kind="input")["default_samplerate"])
+
+
+def stream_options(buffer, sample_rate, blocksize, device_rate):
+    """
+    InputStream arguments that deliver sample_rate audio into buffer. A device running at
+    another rate is opened at its own rate and block size, and each block is resampled in the
+    callback, instead of leaving the conversion to the audio driver.
+    """
+    if device_rate == sample_rate:
+        write = buffer.write
+    else:
+        resampler = PolyphaseResampler(device_rate, sample_rate)
+        # Let PortAudio pick the block size that suits the device
+        blocksize = 0
+
+        def write(samples):
+            buffer.write(resampler.process(samples))
+
+    return {
+        "samplerate": device_rate,
+        "channels": 1,
+        "dtype": "int16",
+        "blocksize": blocksize,
+        "callback": lambda indata, frames, time, status: write(indata[:, 0]),
+    }
+
+
+class CaptureService:
+    """
+    Keeps one input stream open between dictations, so starting a session doesn't pay for
+    opening the device and can include the audio from just before the hotkey was pressed.
+    Only one session reads from the service at a time.
+    """
+
+    def __init__(self, sample_rate=16000, blocksize=480, max_preroll=16000, device_rate=None):
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.device_rate = device_rate
+        # Room for the pre-roll plus the same headroom record_and_transcribe gives its own buffer
+        self.buffer = RingBuffer(max_preroll + sample_rate * 2)
+        self._stream = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        import sounddevice as sd
+
+        with self._lock:
+            if self._stream is not None and self._stream.active:
+                return
+            # The stream stops by itself if the device goes away; open a new one in that case
+            if self._stream is not None:
+                self._stream.close()
+            # A new resampler per stream, since the old stream's filter history doesn't carry over
+            self._stream = sd.InputStream(
+                **stream_options(
+                    self.buffer,
+                    self.sample_rate,
+                    self.blocksize,
+                    device_sample_rate(self.device_rate),
+                )
+            )
+            self._stream.start()
+
+    def open_session(self, preroll):
+        """Return the buffer to read the session from, starting preroll samples in the past."""
+        self.start()
+        self.buffer.seek_latest(preroll)
+        return self.buffer
+
+
+capture_service = None
+
+
+def get_capture_service(sample_rate, blocksize, device_rate=None):
+    global capture_service
+    if capture_service is None:
+        capture_service = CaptureService(sample_rate, blocksize, device_rate=device_rate)
+    return capture_service
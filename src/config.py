@@ -0,0 +1,212 @@
+import json
+import os
+
+
+def load_config_with_defaults():
+    default_config = {
+        "use_api": True,
+        "api_options": {
+            "model": "whisper-1",
+            "language": None,
+            "temperature": 0.0,
+            "initial_prompt": None,
+            "api_base": None,
+            "request_timeout": 30,
+            "max_retries": 2,
+            "upload_format": "auto",
+            "compress_above": 64,
+        },
+        "local_model_options": {
+            "model": "base",
+            "device": None,
+            "language": None,
+            "temperature": 0.0,
+            "initial_prompt": None,
+            "condition_on_previous_text": True,
+            "verbose": False,
+            "preset": None,
+        },
+        "engine": None,
+        "faster_whisper_options": {
+            "model": "small.en",
+            "device": "cpu",
+            "compute_type": "int8",
+            "cpu_threads": 0,
+            "num_workers": 1,
+            "beam_size": 5,
+            "vad_filter": False,
+            "language": None,
+            "temperature": 0.0,
+            "initial_prompt": None,
+            "condition_on_previous_text": True,
+            "verbose": False,
+            "preset": None,
+        },
+        "decoding_presets": {
+            "openai-whisper": {
+                "fast": {
+                    "beam_size": None,
+                    "best_of": None,
+                    "temperature": [0.0],
+                    "condition_on_previous_text": False,
+                    "without_timestamps": True,
+                },
+                "balanced": {
+                    "beam_size": None,
+                    "best_of": 2,
+                    "temperature": [0.0, 0.4, 0.8],
+                    "compression_ratio_threshold": 2.4,
+                    "logprob_threshold": -1.0,
+                    "no_speech_threshold": 0.6,
+                    "condition_on_previous_text": False,
+                    "without_timestamps": True,
+                },
+                "accurate": {
+                    "beam_size": 5,
+                    "best_of": 5,
+                    "temperature": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+                    "compression_ratio_threshold": 2.4,
+                    "logprob_threshold": -1.0,
+                    "no_speech_threshold": 0.6,
+                    "condition_on_previous_text": True,
+                    "without_timestamps": False,
+                },
+            },
+            "faster-whisper": {
+                "fast": {
+                    "beam_size": 1,
+                    "best_of": 1,
+                    "temperature": [0.0],
+                    "condition_on_previous_text": False,
+                    "without_timestamps": True,
+                },
+                "balanced": {
+                    "beam_size": 2,
+                    "best_of": 2,
+                    "temperature": [0.0, 0.4, 0.8],
+                    "compression_ratio_threshold": 2.4,
+                    "log_prob_threshold": -1.0,
+                    "no_speech_threshold": 0.6,
+                    "condition_on_previous_text": False,
+                    "without_timestamps": True,
+                },
+                "accurate": {
+                    "beam_size": 5,
+                    "best_of": 5,
+                    "temperature": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+                    "compression_ratio_threshold": 2.4,
+                    "log_prob_threshold": -1.0,
+                    "no_speech_threshold": 0.6,
+                    "condition_on_previous_text": True,
+                    "without_timestamps": False,
+                },
+            },
+        },
+        "hedged_options": {
+            "local_engine": "faster-whisper",
+            "delay": 500,
+        },
+        "model_scheduler": {
+            "enabled": False,
+            "target_latency": 1000,
+            "models": ["tiny", "base", "small", "medium"],
+            "state_file": None,
+        },
+        "model_cache": {
+            "max_resident": 2,
+            "idle_timeout": 600,
+        },
+        "inference_workers": {
+            "processes": 0,
+        },
+        "result_cache": {
+            "enabled": False,
+            "max_entries": 1000,
+            "directory": None,
+            "max_disk_size": 100,
+        },
+        "journal": {
+            "enabled": False,
+            "directory": "journal",
+            "segment_size": 64,
+        },
+        "streaming": {
+            "enabled": False,
+            "pause_duration": 300,
+            "min_chunk_duration": 2000,
+        },
+        "capture": {
+            "persistent_stream": False,
+            "preroll_duration": 300,
+            "device_sample_rate": None,
+        },
+        "vad_options": {
+            "aggressiveness": 3,
+            "silence_threshold": 150,
+            "speech_threshold": 3000,
+            "max_zero_crossing_rate": 0.25,
+        },
+        "metrics": {
+            "prometheus_file": None,
+        },
+        "injection": {
+            "backend": "auto",
+        },
+        "server": {
+            "address": "tcp://*:5555",
+            "transcribe_workers": 2,
+        },
+        "batching": {
+            "enabled": False,
+            "max_batch_size": 8,
+            "max_wait": 50,
+        },
+        "activation_key": "ctrl+alt+space",
+        "silence_duration": 900,
+        "writing_key_press_delay": 0.008,
+        "remove_trailing_period": True,
+        "add_trailing_space": False,
+        "remove_capitalization": False,
+        "print_to_terminal": True,
+        "save_debug_audio": False,
+    }
+
+    config_path = os.path.join("src", "config.json")
+    if os.path.isfile(config_path):
+        with open(config_path, "r") as config_file:
+            merge_config(default_config, json.load(config_file))
+
+    return default_config
+
+
+def merge_config(config, overrides):
+    """
+    Apply overrides to config in place and return it. Keys that config doesn't have and null
+    values are ignored, and options missing from a nested section keep their current values.
+    """
+    for key, value in overrides.items():
+        if key not in config or value is None:
+            continue
+        if isinstance(config[key], dict) and isinstance(value, dict):
+            config[key].update(value)
+        else:
+            config[key] = value
+    return config
+
+
+def load_tool_config(overrides=None, engine=None, preset=None):
+    """
+    The configuration for the command-line tools: the defaults and config.json, then overrides
+    (a tool's --config JSON object), then engine as "engine[:model]" and a decoding preset for
+    that engine.
+    """
+    from engines import get_engine
+
+    config = merge_config(load_config_with_defaults(), overrides or {})
+    if engine:
+        config["engine"], _, model = engine.partition(":")
+        if model:
+            config[get_engine(config).options_key]["model"] = model
+    if preset:
+        config[get_engine(config).options_key]["preset"] = preset
+    return config
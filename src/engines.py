@@ -0,0 +1,400 @@
+import io
+import threading
+import wave
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+from loguru import logger
+
+from api_client import get_client
+from model_cache import configure_model_cache, model_cache
+
+
+def int16_to_float32(audio_data):
+    return audio_data.astype(np.float32) / 32768.0
+
+
+def encode_wav(audio_data, sample_rate):
+    """Encode int16 samples as an in-memory mono WAV file."""
+    wav_file = io.BytesIO()
+    with wave.open(wav_file, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)  # 2 bytes (16 bits) per sample
+        wf.setframerate(sample_rate)
+        wf.writeframes(audio_data.tobytes())
+    # The OpenAI client uses the file name to tell the API which format it is uploading
+    wav_file.name = "audio.wav"
+    wav_file.seek(0)
+    return wav_file
+
+
+# Set once the missing soundfile package has been reported, so it is logged only once
+_flac_unavailable_logged = False
+
+
+def encode_flac(audio_data, sample_rate):
+    """Encode int16 samples as an in-memory FLAC file, or return None if soundfile is missing."""
+    global _flac_unavailable_logged
+    try:
+        import soundfile
+    except ImportError:
+        if not _flac_unavailable_logged:
+            _flac_unavailable_logged = True
+            logger.warning(
+                "soundfile is not installed, so recordings are uploaded as WAV instead of FLAC; "
+                "run `pip install soundfile` to compress them"
+            )
+        return None
+    flac_file = io.BytesIO()
+    soundfile.write(flac_file, audio_data, sample_rate, format="FLAC", subtype="PCM_16")
+    flac_file.name = "audio.flac"
+    flac_file.seek(0)
+    return flac_file
+
+
+def encode_upload(audio_data, sample_rate, upload_format="auto", compress_above=64 * 1024):
+    """
+    Encode samples for upload. "auto" compresses to FLAC (lossless, roughly half the size of
+    speech as WAV) once the WAV would be larger than compress_above bytes; shorter recordings
+    upload faster than they compress.
+    """
+    if upload_format == "flac" or (upload_format == "auto" and audio_data.nbytes > compress_above):
+        flac_file = encode_flac(audio_data, sample_rate)
+        if flac_file is not None:
+            return flac_file
+    return encode_wav(audio_data, sample_rate)
+
+
+class TranscriptionEngine:
+    """
+    A way of turning int16 samples into text. Engines are cheap to create; local models live in
+    the shared model cache, so creating an engine per utterance doesn't reload anything.
+    """
+
+    name = None
+    description = None
+    options_key = None
+    # Whether transcribe_segments gives real timestamps or one segment for the whole input
+    segment_timestamps = False
+
+    def __init__(self, config):
+        self.config = config
+        self.options = config[self.options_key]
+
+    @property
+    def model_name(self):
+        return self.options["model"]
+
+    @property
+    def initial_prompt(self):
+        """The prompt used when transcribe is given none."""
+        return self.options["initial_prompt"]
+
+    def preload(self):
+        """Import the backend and load its model ahead of the first utterance."""
+
+    def transcribe(self, audio_data, sample_rate=16000, prompt=None, cancel=None):
+        """
+        Return the text for int16 samples. prompt overrides the configured initial prompt. cancel
+        is an optional threading.Event; engines that can stop early do so once it is set, and
+        their result is then meaningless.
+        """
+        raise NotImplementedError
+
+    def decode_options(self):
+        """Decoding parameters from the engine's preset, which override its other options."""
+        preset = self.options.get("preset")
+        if not preset:
+            return {}
+        presets = self.config["decoding_presets"].get(self.name, {})
+        if preset not in presets:
+            raise ValueError(
+                f"Unknown decoding preset {preset!r} for {self.name}, "
+                f"expected one of: {', '.join(presets)}"
+            )
+        return presets[preset]
+
+    def cache_identity(self):
+        """
+        Everything about the engine that affects its text, for keying cached results. It has the
+        preset's parameters rather than just its name, so editing a preset takes effect.
+        """
+        return [self.name, self.model_name, self.options, self.decode_options()]
+
+    def transcribe_batch(self, utterances, sample_rate=16000):
+        """Transcribe several utterances; engines that can decode a padded batch override this."""
+        return [self.transcribe(audio_data, sample_rate) for audio_data in utterances]
+
+    def transcribe_segments(self, audio_data, sample_rate=16000, prompt=None):
+        """Return (start, end, text) segments with times in seconds from the start of the audio."""
+        text = self.transcribe(audio_data, sample_rate, prompt)
+        return [(0.0, len(audio_data) / sample_rate, text)]
+
+
+class OpenAIAPIEngine(TranscriptionEngine):
+    name = "openai-api"
+    description = "OpenAI's API"
+    options_key = "api_options"
+
+    def preload(self):
+        get_client(self.options).warm_up()
+
+    def transcribe(self, audio_data, sample_rate=16000, prompt=None, cancel=None):
+        return get_client(self.options).transcribe(
+            encode_upload(
+                audio_data,
+                sample_rate,
+                self.options["upload_format"],
+                self.options["compress_above"] * 1024,
+            ),
+            model=self.options["model"],
+            language=self.options["language"],
+            prompt=prompt or self.initial_prompt,
+            temperature=self.options["temperature"],
+            cancel=cancel,
+        )
+
+
+class OpenAIWhisperEngine(TranscriptionEngine):
+    name = "openai-whisper"
+    description = "a local Whisper model"
+    options_key = "local_model_options"
+    # Decoding installs key/value cache hooks on the shared model, so only one call can run at once
+    _inference_lock = threading.Lock()
+
+    @property
+    def segment_timestamps(self):
+        return not self.decode_options().get("without_timestamps", False)
+
+    def load_model(self):
+        import whisper
+
+        configure_model_cache(self.config)
+        return model_cache.get(
+            (self.name, self.options["model"], self.options["device"], None),
+            lambda: whisper.load_model(name=self.options["model"], device=self.options["device"]),
+        )
+
+    def preload(self):
+        self.load_model()
+
+    def transcribe(self, audio_data, sample_rate=16000, prompt=None, cancel=None):
+        # A decode in progress can't be interrupted, so cancel is not checked
+        return self.decode(audio_data, prompt).get("text")
+
+    def transcribe_segments(self, audio_data, sample_rate=16000, prompt=None):
+        segments = self.decode(audio_data, prompt)["segments"]
+        return [(segment["start"], segment["end"], segment["text"]) for segment in segments]
+
+    def decode(self, audio_data, prompt=None):
+        model = self.load_model()
+        decoding = {
+            "condition_on_previous_text": self.options["condition_on_previous_text"],
+            "temperature": self.options["temperature"],
+            **self.decode_options(),
+        }
+        with self._inference_lock:
+            # The model takes float32 samples in [-1, 1] directly, skipping the ffmpeg decode
+            response = model.transcribe(
+                audio=int16_to_float32(audio_data),
+                language=self.options["language"],
+                verbose=None if not self.config["print_to_terminal"] else self.options["verbose"],
+                initial_prompt=prompt or self.initial_prompt,
+                **decoding,
+            )
+        return response
+
+    def transcribe_batch(self, utterances, sample_rate=16000):
+        import torch
+        import whisper
+
+        model = self.load_model()
+        # One decoder pass covers a 30 second window, so longer utterances go one at a time
+        short = [i for i, audio in enumerate(utterances) if len(audio) <= whisper.N_SAMPLES]
+        texts = [None] * len(utterances)
+        for i in set(range(len(utterances))) - set(short):
+            texts[i] = self.transcribe(utterances[i], sample_rate)
+        if not short:
+            return texts
+
+        # Pad every utterance to 30 seconds and decode them as one batch
+        mel = torch.stack(
+            [
+                whisper.log_mel_spectrogram(
+                    whisper.pad_or_trim(int16_to_float32(utterances[i])), model.dims.n_mels
+                )
+                for i in short
+            ]
+        ).to(model.device)
+        options = whisper.DecodingOptions(
+            language=self.options["language"],
+            temperature=self.options["temperature"],
+            prompt=self.initial_prompt,
+            without_timestamps=True,
+            fp16=model.device.type == "cuda",
+        )
+        with self._inference_lock:
+            results = whisper.decode(model, mel, options)
+        for i, result in zip(short, results):
+            texts[i] = result.text
+        return texts
+
+
+class FasterWhisperEngine(TranscriptionEngine):
+    name = "faster-whisper"
+    description = "a local faster-whisper model"
+    options_key = "faster_whisper_options"
+
+    @property
+    def segment_timestamps(self):
+        return not self.decode_options().get("without_timestamps", False)
+
+    def load_model(self):
+        from faster_whisper import WhisperModel
+
+        configure_model_cache(self.config)
+        # model_size_or_path: Size of the model to use (tiny, tiny.en, base, base.en,
+        #  small, small.en, medium, medium.en, large-v1, large-v2, or large), a path to a
+        #  converted model directory, or a CTranslate2-converted Whisper model ID from the
+        #  Hugging Face Hub.
+        options = self.options
+        return model_cache.get(
+            (self.name, options["model"], options["device"], options["compute_type"]),
+            lambda: WhisperModel(
+                options["model"],
+                device=options["device"],
+                compute_type=options["compute_type"],
+                cpu_threads=options["cpu_threads"],
+                num_workers=options["num_workers"],
+            ),
+        )
+
+    def preload(self):
+        self.load_model()
+
+    def transcribe(self, audio_data, sample_rate=16000, prompt=None, cancel=None):
+        segments = self.transcribe_segments(audio_data, sample_rate, prompt, cancel)
+        return "".join(text for _, _, text in segments)
+
+    def transcribe_segments(self, audio_data, sample_rate=16000, prompt=None, cancel=None):
+        decoding = {
+            "beam_size": self.options["beam_size"],
+            "condition_on_previous_text": self.options["condition_on_previous_text"],
+            "temperature": self.options["temperature"],
+            **self.decode_options(),
+        }
+        segments, info = self.load_model().transcribe(
+            int16_to_float32(audio_data),
+            language=self.options["language"],
+            vad_filter=self.options["vad_filter"],
+            initial_prompt=prompt or self.initial_prompt,
+            **decoding,
+        )
+        # segments is a generator; decoding happens while it is consumed, so stopping early
+        # skips the rest of the work
+        results = []
+        for segment in segments:
+            if cancel is not None and cancel.is_set():
+                break
+            results.append((segment.start, segment.end, segment.text))
+        if self.config["print_to_terminal"] and self.options["verbose"]:
+            print(f"Detected language '{info.language}' ({info.language_probability:.2f})")
+        return results
+
+
+class HedgedEngine(TranscriptionEngine):
+    """
+    Sends each utterance to the API and, if no answer has come back after a delay, to a local
+    model as well, and returns whichever text arrives first. The other request is told to stop
+    (the API client makes no further attempts and faster-whisper stops decoding at the next
+    segment). If the API fails, the local model's text is used.
+    """
+
+    name = "hedged"
+    description = "OpenAI's API, hedged with a local model"
+    options_key = "hedged_options"
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.api = OpenAIAPIEngine(config)
+        self.local = get_engine(config, self.options["local_engine"])
+
+    @property
+    def model_name(self):
+        return f"{self.api.model_name}+{self.local.model_name}"
+
+    @property
+    def initial_prompt(self):
+        # The API is asked first, so streamed chunks build on its prompt
+        return self.api.initial_prompt
+
+    def cache_identity(self):
+        # Either engine's text can be returned, so both engines' settings go into the key
+        return [self.name, self.options, self.api.cache_identity(), self.local.cache_identity()]
+
+    @classmethod
+    def executor(cls):
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(thread_name_prefix="hedged")
+            return cls._executor
+
+    def preload(self):
+        self.api.preload()
+        self.local.preload()
+
+    def transcribe(self, audio_data, sample_rate=16000, prompt=None, cancel=None):
+        def start(engine):
+            stop = threading.Event()
+            future = self.executor().submit(
+                engine.transcribe, audio_data, sample_rate, prompt, stop
+            )
+            running[future] = (engine, stop)
+            return future
+
+        running = {}
+        api = start(self.api)
+        done, _ = wait([api], timeout=self.options["delay"] / 1000)
+        if done:
+            del running[api]
+            if api.exception() is None:
+                return api.result()
+            logger.warning(f"The API failed, transcribing locally instead: {api.exception()}")
+            return self.local.transcribe(audio_data, sample_rate, prompt, cancel)
+
+        # The API is taking longer than the delay; hedge with the local model
+        start(self.local)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                engine, _ = running.pop(future)
+                if future.exception() is None:
+                    for _, stop in running.values():
+                        stop.set()
+                    logger.debug(f"{engine.name} answered first")
+                    return future.result()
+                error = future.exception()
+                logger.warning(f"{engine.name} failed: {error}")
+        raise error
+
+
+ENGINES = {
+    engine.name: engine
+    for engine in (OpenAIAPIEngine, OpenAIWhisperEngine, FasterWhisperEngine, HedgedEngine)
+}
+
+
+def engine_name(config):
+    """The configured engine, falling back to use_api for configs without an "engine" value."""
+    if config.get("engine"):
+        return config["engine"]
+    return OpenAIAPIEngine.name if config["use_api"] else OpenAIWhisperEngine.name
+
+
+def get_engine(config, name=None):
+    name = name or engine_name(config)
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine {name!r}, expected one of: {', '.join(ENGINES)}")
+    return ENGINES[name](config)
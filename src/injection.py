@@ -0,0 +1,189 @@
+import shutil
+import subprocess
+import sys
+import time
+
+from loguru import logger
+
+
+class Injector:
+    """
+    A way of writing text into the active window. Each injector keeps a running estimate of its
+    fixed overhead and per-character cost, so the fastest one can be picked for a given text.
+    """
+
+    name = None
+    # Weight given to the newest measurement in the running estimates
+    smoothing = 0.3
+
+    def __init__(self, config):
+        self.config = config
+        self.overhead = 0.0
+        self.seconds_per_char = 0.0
+        self.chars = 0
+        self.seconds = 0.0
+
+    def available(self):
+        return True
+
+    def estimate(self, text):
+        return self.overhead + self.seconds_per_char * len(text)
+
+    @property
+    def chars_per_second(self):
+        return self.chars / self.seconds if self.seconds else None
+
+    def inject(self, text):
+        start = time.perf_counter()
+        self.write(text)
+        elapsed = time.perf_counter() - start
+
+        self.chars += len(text)
+        self.seconds += elapsed
+        self.update_estimate(text, elapsed)
+        logger.debug(f"{self.name} wrote {len(text)} characters at {len(text) / elapsed:.0f}/s")
+
+    def update_estimate(self, text, elapsed):
+        per_char = max(0.0, elapsed - self.overhead) / len(text)
+        self.seconds_per_char += self.smoothing * (per_char - self.seconds_per_char)
+
+    def write(self, text):
+        raise NotImplementedError
+
+
+class KeystrokeInjector(Injector):
+    """One synthetic key press per character through pyautogui; works everywhere."""
+
+    name = "keystrokes"
+
+    def __init__(self, config):
+        super().__init__(config)
+        # pyautogui sleeps for the interval after each key, on top of sending the event
+        self.seconds_per_char = config["writing_key_press_delay"] + 0.002
+
+    def write(self, text):
+        import pyautogui
+
+        pyautogui.write(text, interval=self.config["writing_key_press_delay"])
+
+
+class CommandInjector(Injector):
+    """Types the whole text with one call to an external tool."""
+
+    command = None
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.overhead = 0.02  # starting the process
+        self.seconds_per_char = self.key_delay_ms() / 1000
+
+    def key_delay_ms(self):
+        return max(1, round(self.config["writing_key_press_delay"] * 1000))
+
+    def available(self):
+        return sys.platform.startswith("linux") and shutil.which(self.command) is not None
+
+    def write(self, text):
+        subprocess.run(self.args(text), check=True)
+
+
+class XdotoolInjector(CommandInjector):
+    """Types through the X server with xdotool (X11 only)."""
+
+    name = "xdotool"
+    command = "xdotool"
+
+    def args(self, text):
+        delay = str(self.key_delay_ms())
+        return ["xdotool", "type", "--clearmodifiers", "--delay", delay, "--", text]
+
+
+class YdotoolInjector(CommandInjector):
+    """Types through the kernel's uinput device with ydotool, which also works on Wayland."""
+
+    name = "ydotool"
+    command = "ydotool"
+
+    def args(self, text):
+        return ["ydotool", "type", "--key-delay", str(self.key_delay_ms()), "--", text]
+
+
+class ClipboardInjector(Injector):
+    """
+    Copies the text to the clipboard and presses paste, so the cost doesn't grow with the length
+    of the text. The previous clipboard contents are put back afterwards.
+    """
+
+    name = "clipboard"
+    # The target application reads the clipboard after it handles the paste keys
+    restore_delay = 0.1
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.overhead = self.restore_delay + 0.05
+
+    def available(self):
+        try:
+            import pyperclip
+
+            pyperclip.paste()
+            return True
+        except Exception:
+            return False
+
+    def update_estimate(self, text, elapsed):
+        self.overhead += self.smoothing * (elapsed - self.overhead)
+
+    def write(self, text):
+        import pyautogui
+        import pyperclip
+
+        previous = pyperclip.paste()
+        pyperclip.copy(text)
+        try:
+            pyautogui.hotkey("command" if sys.platform == "darwin" else "ctrl", "v")
+            time.sleep(self.restore_delay)
+        finally:
+            pyperclip.copy(previous)
+
+
+INJECTORS = {
+    injector.name: injector
+    for injector in (KeystrokeInjector, XdotoolInjector, YdotoolInjector, ClipboardInjector)
+}
+
+# Created once so the running estimates carry over from one dictation to the next
+_injectors = {}
+
+
+def get_injectors(config):
+    if not _injectors:
+        for name, injector in INJECTORS.items():
+            instance = injector(config)
+            if instance.available():
+                _injectors[name] = instance
+    return _injectors
+
+
+def choose_injector(text, config):
+    """The configured injector, or with "auto" the one expected to write text the fastest."""
+    injectors = get_injectors(config)
+    backend = (config.get("injection") or {}).get("backend", "auto")
+    if backend != "auto":
+        if backend not in injectors:
+            logger.warning(f"Injection backend {backend!r} is not available, typing instead")
+            return injectors[KeystrokeInjector.name]
+        return injectors[backend]
+    return min(injectors.values(), key=lambda injector: injector.estimate(text))
+
+
+def inject_text(text, config):
+    injector = choose_injector(text, config)
+    try:
+        injector.inject(text)
+    except Exception:
+        if injector.name == KeystrokeInjector.name:
+            raise
+        # Fall back to typing the text rather than losing it
+        logger.exception(f"{injector.name} failed, typing instead")
+        get_injectors(config)[KeystrokeInjector.name].inject(text)
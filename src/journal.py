@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from loguru import logger
+
+INDEX_FILE = "index.jsonl"
+
+
+class UtteranceJournal:
+    """
+    An append-only record of dictated audio and what it was transcribed as, for replaying real
+    recordings when testing for regressions.
+
+    Samples are appended as raw int16 to segment files (a new one is started once a segment
+    reaches segment_size bytes), and index.jsonl gets one line per utterance with its segment,
+    sample offset and length, sample rate, time, engine, model, latency and transcript. The
+    samples are written before their index line, so an interrupted write never leaves an entry
+    pointing at missing audio. Reading maps the segment files instead of loading them.
+    """
+
+    def __init__(self, directory, segment_size=64 * 1024 * 1024):
+        self.directory = directory
+        self.segment_size = segment_size
+        self._lock = threading.Lock()
+        self._maps = {}
+        self._index_checked = False
+        # One writer keeps entries in order; its thread finishes queued writes at exit
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="journal")
+
+    def segment_path(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:06d}.pcm")
+
+    def append(self, audio_data, sample_rate, **details):
+        """Record int16 samples with details such as engine, model, latency and text."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            segment = self._current_segment(audio_data.nbytes)
+            with open(self.segment_path(segment), "ab") as segment_file:
+                offset = segment_file.tell() // 2
+                segment_file.write(np.ascontiguousarray(audio_data, dtype="<i2").tobytes())
+            entry = {
+                "segment": segment,
+                "offset": offset,
+                "length": len(audio_data),
+                "sample_rate": sample_rate,
+                "time": time.time(),
+                **details,
+            }
+            with open(os.path.join(self.directory, INDEX_FILE), "ab") as index:
+                self._drop_partial_line(index)
+                index.write((json.dumps(entry) + "\n").encode("utf-8"))
+        return entry
+
+    def append_later(self, audio_data, sample_rate, **details):
+        """
+        Like append, but written on a background thread so the caller doesn't wait for the disk.
+        A failed write is logged. audio_data must not be modified afterwards.
+        """
+        return self._writer.submit(self._append_logged, audio_data, sample_rate, details)
+
+    def _append_logged(self, audio_data, sample_rate, details):
+        try:
+            return self.append(audio_data, sample_rate, **details)
+        except OSError:
+            logger.exception(f"Could not add the recording to the journal in {self.directory}")
+
+    def entries(self):
+        """Every complete entry in the index, oldest first."""
+        path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.isfile(path):
+            return []
+        with open(path, "r", encoding="utf-8") as index:
+            # A last line cut off while it was being written is skipped
+            return [json.loads(line) for line in index if line.endswith("\n")]
+
+    def read(self, entry):
+        """The entry's samples as a read-only int16 array backed by its segment file."""
+        segment = entry["segment"]
+        mapping = self._maps.get(segment)
+        if mapping is None or len(mapping) < entry["offset"] + entry["length"]:
+            # Mapped again if the segment has grown since it was last mapped
+            mapping = self._maps[segment] = np.memmap(
+                self.segment_path(segment), dtype="<i2", mode="r"
+            )
+        return mapping[entry["offset"] : entry["offset"] + entry["length"]]
+
+    def _drop_partial_line(self, index):
+        # A last line cut off by an interrupted run is removed, once, so entries start a line
+        if self._index_checked:
+            return
+        self._index_checked = True
+        with open(index.name, "rb") as reader:
+            content = reader.read()
+        complete = content.rfind(b"\n") + 1
+        if complete < len(content):
+            index.truncate(complete)
+
+    def _current_segment(self, nbytes):
+        # Caller holds self._lock
+        segments = sorted(
+            int(name[len("segment-") : -len(".pcm")])
+            for name in os.listdir(self.directory)
+            if name.startswith("segment-") and name.endswith(".pcm")
+        )
+        if not segments:
+            return 1
+        size = os.path.getsize(self.segment_path(segments[-1]))
+        if size and size + nbytes > self.segment_size:
+            return segments[-1] + 1
+        return segments[-1]
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal(config):
+    """The process-wide journal, or None if it is disabled."""
+    global _journal
+    options = config["journal"]
+    if not options["enabled"]:
+        return None
+    with _journal_lock:
+        if _journal is None:
+            _journal = UtteranceJournal(
+                options["directory"], segment_size=options["segment_size"] * 1024 * 1024
+            )
+        return _journal
@@ -0,0 +1,98 @@
+import os
+import struct
+
+import numpy as np
+from loguru import logger
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def read_wav_memmap(path):
+    """
+    Map the samples of a 16-bit PCM WAV file without reading them.
+
+    Returns the first channel as a read-only int16 array backed by the file, and the sample
+    rate. Pages are read from disk only when the samples are used, so the file can be longer
+    than the memory available.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        riff, _, wave_id = struct.unpack("<4sI4s", file.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"{path}: not a WAV file")
+
+        channels = sample_rate = None
+        while True:
+            header = file.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{path}: no data chunk")
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                audio_format, channels, sample_rate, _, _, bits = struct.unpack(
+                    "<HHIIHH", file.read(16)
+                )
+                if audio_format not in (WAVE_FORMAT_PCM, WAVE_FORMAT_EXTENSIBLE) or bits != 16:
+                    raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+                file.seek(chunk_size - 16 + chunk_size % 2, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if channels is None:
+                    raise ValueError(f"{path}: data chunk before fmt chunk")
+                offset = file.tell()
+                # Files written while recording may leave the size at 0 or 0xFFFFFFFF
+                data_size = min(chunk_size or file_size, file_size - offset)
+                break
+            else:
+                # Chunks are padded to an even size
+                file.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+    num_frames = data_size // (2 * channels)
+    if num_frames == 0:
+        return np.zeros(0, dtype=np.int16), sample_rate
+    samples = np.memmap(path, dtype="<i2", mode="r", offset=offset, shape=(num_frames, channels))
+    return samples[:, 0], sample_rate
+
+
+def windows(num_samples, window_size, overlap):
+    """(start, end) sample ranges of window_size that overlap by overlap samples."""
+    step = window_size - overlap
+    start = 0
+    while True:
+        end = min(start + window_size, num_samples)
+        yield start, end
+        if end == num_samples:
+            return
+        start += step
+
+
+def transcribe_long(engine, samples, sample_rate=16000, window_duration=30, overlap_duration=5):
+    """
+    Transcribe audio of any length a window at a time and return (start, end, text) segments.
+
+    Only one window is copied out of samples (which can be a memmap) at a time, so memory use
+    doesn't grow with the length of the audio. Windows overlap so words at a boundary are heard
+    whole by one of them; each segment is kept by the window whose share of the overlap its
+    midpoint falls in. Engines without segment timestamps get windows that don't overlap, since
+    their text can't be split at the boundary. The end of the text so far is the prompt for the
+    next window.
+    """
+    window_size = int(window_duration * sample_rate)
+    overlap = int(overlap_duration * sample_rate) if engine.segment_timestamps else 0
+    prompt = None
+    segments = []
+    for start, end in windows(len(samples), window_size, overlap):
+        window = np.ascontiguousarray(samples[start:end], dtype=np.int16)
+        # Each window owns half of the overlap on either side of it
+        keep_from = start + overlap / 2 if start > 0 else 0
+        keep_until = end - overlap / 2 if end < len(samples) else float("inf")
+        for segment_start, segment_end, text in engine.transcribe_segments(
+            window, sample_rate, prompt
+        ):
+            midpoint = start + (segment_start + segment_end) / 2 * sample_rate
+            if keep_from <= midpoint < keep_until:
+                segments.append(
+                    (start / sample_rate + segment_start, start / sample_rate + segment_end, text)
+                )
+        prompt = "".join(text for _, _, text in segments[-8:])[-200:] or None
+        logger.debug(f"Transcribed {end / sample_rate:.0f}s of {len(samples) / sample_rate:.0f}s")
+    return segments
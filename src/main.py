@@ -1,13 +1,15 @@
-import json
 import os
 import queue
 import threading
 
 import keyboard
-import pyautogui
 
-from status_window import StatusWindow
-from transcription import record_and_transcribe
+from config import load_config_with_defaults
+from engines import get_engine
+from injection import inject_text
+from metrics import SessionTimer, record_session
+from status_window import StatusQueue, StatusWindow
+from transcription import preload_backend, record_and_transcribe
 
 
 class ResultThread(threading.Thread):
@@ -25,44 +27,6 @@ class ResultThread(threading.Thread):
         self.stop_transcription = True
 
 
-def load_config_with_defaults():
-    default_config = {
-        "use_api": True,
-        "api_options": {
-            "model": "whisper-1",
-            "language": None,
-            "temperature": 0.0,
-            "initial_prompt": None,
-        },
-        "local_model_options": {
-            "model": "base",
-            "device": None,
-            "language": None,
-            "temperature": 0.0,
-            "initial_prompt": None,
-            "condition_on_previous_text": True,
-            "verbose": False,
-        },
-        "activation_key": "ctrl+alt+space",
-        "silence_duration": 900,
-        "writing_key_press_delay": 0.008,
-        "remove_trailing_period": True,
-        "add_trailing_space": False,
-        "remove_capitalization": False,
-        "print_to_terminal": True,
-    }
-
-    config_path = os.path.join("src", "config.json")
-    if os.path.isfile(config_path):
-        with open(config_path, "r") as config_file:
-            user_config = json.load(config_file)
-            for key, value in user_config.items():
-                if key in default_config and value is not None:
-                    default_config[key] = value
-
-    return default_config
-
-
 def clear_status_queue():
     while not status_queue.empty():
         try:
@@ -72,27 +36,31 @@ def clear_status_queue():
 
 
 def on_shortcut():
-    global status_queue
+    session = SessionTimer()
+    session.mark("hotkey")
     clear_status_queue()
 
     status_queue.put(("recording", "Recording..."))
     recording_thread = ResultThread(
-        target=record_and_transcribe, args=(status_queue,), kwargs={"config": config}
+        target=record_and_transcribe,
+        args=(status_queue,),
+        kwargs={"config": config, "session": session},
     )
-    status_window = StatusWindow(status_queue)
     status_window.recording_thread = recording_thread
-    status_window.start()
     recording_thread.start()
 
     recording_thread.join()
-
-    if status_window.is_alive():
-        status_queue.put(("cancel", ""))
+    # Make sure the window is hidden however the recording ended
+    status_queue.put(("idle", ""))
 
     transcribed_text = recording_thread.result
 
     if transcribed_text:
-        pyautogui.write(transcribed_text, interval=config["writing_key_press_delay"])
+        session.mark("injection_start")
+        inject_text(transcribed_text, config)
+        session.mark("injection_end")
+
+    record_session(session, config)
 
 
 def format_keystrokes(key_string):
@@ -100,21 +68,27 @@ def format_keystrokes(key_string):
 
 
 # Main script
+if __name__ == "__main__":
+    config = load_config_with_defaults()
+    method = get_engine(config).description
+    status_queue = StatusQueue()
+    # One status window for the whole run, shown and hidden for each recording
+    status_window = StatusWindow(status_queue)
+    status_window.start()
+
+    keyboard.add_hotkey(config["activation_key"], on_shortcut)
 
-config = load_config_with_defaults()
-method = "OpenAI's API" if config["use_api"] else "a local model"
-status_queue = queue.Queue()
-
-keyboard.add_hotkey(config["activation_key"], on_shortcut)
-
-print(
-    f'Script activated. Whisper is set to run using {method}. To change this, modify the "use_api" value in the src\\config.json file.'
-)
-print(
-    f'Press {format_keystrokes(config["activation_key"])} to start recording and transcribing. Press Ctrl+C on the terminal window to quit.'
-)
-try:
-    keyboard.wait()  # Keep the script running to listen for the shortcut
-except KeyboardInterrupt:
-    print("\nExiting the script...")
-    os.system("exit")
+    print(
+        f'Script activated. Whisper is set to run using {method}. To change this, modify the "engine" value in the src\\config.json file.'
+    )
+    print(
+        f'Press {format_keystrokes(config["activation_key"])} to start recording and transcribing. Press Ctrl+C on the terminal window to quit.'
+    )
+    # Import the transcription backend in the background now that the hotkey is live
+    threading.Thread(target=preload_backend, args=(config,), daemon=True).start()
+
+    try:
+        keyboard.wait()  # Keep the script running to listen for the shortcut
+    except KeyboardInterrupt:
+        print("\nExiting the script...")
+        os.system("exit")
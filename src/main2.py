@@ -1,4 +1,3 @@
-import json
 import os
 import queue
 import threading
@@ -6,6 +5,7 @@ import threading
 import keyboard
 import pyautogui
 
+from config import load_config_with_defaults
 from status_window import StatusWindow
 from transcription import record_and_transcribe
 
@@ -26,44 +26,6 @@ class ResultThread(threading.Thread):
         self.stop_transcription = True
 
 
-def load_config_with_defaults():
-    default_config = {
-        "use_api": True,
-        "api_options": {
-            "model": "whisper-1",
-            "language": None,
-            "temperature": 0.0,
-            "initial_prompt": None,
-        },
-        "local_model_options": {
-            "model": "base",
-            "device": None,
-            "language": None,
-            "temperature": 0.0,
-            "initial_prompt": None,
-            "condition_on_previous_text": True,
-            "verbose": False,
-        },
-        "activation_key": "ctrl+alt+space",
-        "silence_duration": 900,
-        "writing_key_press_delay": 0.008,
-        "remove_trailing_period": True,
-        "add_trailing_space": False,
-        "remove_capitalization": False,
-        "print_to_terminal": True,
-    }
-
-    config_path = os.path.join("src", "config.json")
-    if os.path.isfile(config_path):
-        with open(config_path, "r") as config_file:
-            user_config = json.load(config_file)
-            for key, value in user_config.items():
-                if key in default_config and value is not None:
-                    default_config[key] = value
-
-    return default_config
-
-
 def clear_status_queue():
     while not status_queue.empty():
         try:
@@ -97,22 +59,22 @@ def format_keystrokes(key_string):
 
 
 # Main script
+if __name__ == "__main__":
+    config = load_config_with_defaults()
+    method = "OpenAI's API" if config["use_api"] else "a local model"
+    status_queue = queue.Queue()
+
+    keyboard.add_hotkey(config["activation_key"], on_shortcut)
+    # keyboard.add_hotkey('F13', on_shortcut)
 
-config = load_config_with_defaults()
-method = "OpenAI's API" if config["use_api"] else "a local model"
-status_queue = queue.Queue()
-
-keyboard.add_hotkey(config["activation_key"], on_shortcut)
-# keyboard.add_hotkey('F13', on_shortcut)
-
-print(
-    f'Script activated. Whisper is set to run using {method}. To change this, modify the "use_api" value in the src\\config.json file.'
-)
-print(
-    f'Press {format_keystrokes(config["activation_key"])} to start recording and transcribing. Press Ctrl+C on the terminal window to quit.'
-)
-try:
-    keyboard.wait()  # Keep the script running to listen for the shortcut
-except KeyboardInterrupt:
-    print("\nExiting the script...")
-    os.system("exit")
+    print(
+        f'Script activated. Whisper is set to run using {method}. To change this, modify the "use_api" value in the src\\config.json file.'
+    )
+    print(
+        f'Press {format_keystrokes(config["activation_key"])} to start recording and transcribing. Press Ctrl+C on the terminal window to quit.'
+    )
+    try:
+        keyboard.wait()  # Keep the script running to listen for the shortcut
+    except KeyboardInterrupt:
+        print("\nExiting the script...")
+        os.system("exit")
@@ -1,16 +1,30 @@
+"""
+Send commands to the transcription server (src/main_z.py) and print the replies, e.g.
+
+    python src/main_client.py start
+    python src/main_client.py "echo hi" test stats
+
+All commands are sent at once over a DEALER socket, each with its own request ID, and the
+replies are printed as they arrive.
+"""
+
+import sys
+import uuid
+
 import zmq
 
 context = zmq.Context()
-print("Connecting to hello world server...")
-socket = context.socket(zmq.REQ)
+print("Connecting to transcription server...")
+socket = context.socket(zmq.DEALER)
 socket.connect("tcp://localhost:5555")
 
-n = 1
-for request in range(n):
-    print(f"Sending request {request} ...")
-    socket.send_string("start")
-    message = socket.recv()
-    print(f"Received reply {request} [ {message} ]")
-
 if __name__ == "__main__":
-    pass
+    commands = sys.argv[1:] or ["start"]
+    for command in commands:
+        request_id = uuid.uuid4().hex[:8]
+        print(f"Sending request {request_id}: {command}")
+        socket.send_multipart([request_id.encode(), b"", command.encode()])
+
+    for _ in commands:
+        request_id, _, message = socket.recv_multipart()
+        print(f"Received reply {request_id.decode()} [ {message.decode()} ]")
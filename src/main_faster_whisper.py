@@ -1,16 +1,15 @@
-import json
-import tempfile
-import wave
-
 import numpy as np
 import sounddevice as sd
 import os
 import threading
 
 import webrtcvad
-from faster_whisper import WhisperModel
 from loguru import logger
 
+from capture import SampleBuffer
+from config import load_config_with_defaults
+from engines import FasterWhisperEngine
+
 
 
 class ResultThread(threading.Thread):
@@ -28,44 +27,6 @@ class ResultThread(threading.Thread):
         self.stop_transcription = True
 
 
-def load_config_with_defaults():
-    default_config = {
-        "use_api": True,
-        "api_options": {
-            "model": "whisper-1",
-            "language": None,
-            "temperature": 0.0,
-            "initial_prompt": None,
-        },
-        "local_model_options": {
-            "model": "base",
-            "device": None,
-            "language": None,
-            "temperature": 0.0,
-            "initial_prompt": None,
-            "condition_on_previous_text": True,
-            "verbose": False,
-        },
-        "activation_key": "ctrl+alt+space",
-        "silence_duration": 900,
-        "writing_key_press_delay": 0.008,
-        "remove_trailing_period": True,
-        "add_trailing_space": False,
-        "remove_capitalization": False,
-        "print_to_terminal": True,
-    }
-
-    config_path = os.path.join("src", "config.json")
-    if os.path.isfile(config_path):
-        with open(config_path, "r") as config_file:
-            user_config = json.load(config_file)
-            for key, value in user_config.items():
-                if key in default_config and value is not None:
-                    default_config[key] = value
-
-    return default_config
-
-
 def record_and_transcribe_fw(status_queue, cancel_flag, config=None):
     sample_rate = 16000
     frame_duration = 30  # 30ms, supported values: 10, 20, 30
@@ -74,7 +35,7 @@ def record_and_transcribe_fw(status_queue, cancel_flag, config=None):
 
     vad = webrtcvad.Vad(3)  # Aggressiveness mode: 3 (highest)
     buffer = []
-    recording = []
+    recording = SampleBuffer()
     num_silent_frames = 0
     num_buffer_frames = buffer_duration // frame_duration
     silence_frames_threshold = silence_duration // frame_duration
@@ -99,7 +60,7 @@ def record_and_transcribe_fw(status_queue, cancel_flag, config=None):
             is_speech = vad.is_speech(np.array(frame).tobytes(), sample_rate)
             if is_speech:
                 logger.debug("Speech detected")
-                recording.extend(frame)
+                recording.extend(np.array(frame, dtype=np.int16))
                 num_silent_frames = 0
             else:
                 logger.debug("Silence detected")
@@ -109,23 +70,12 @@ def record_and_transcribe_fw(status_queue, cancel_flag, config=None):
                 if num_silent_frames >= silence_frames_threshold:
                     break
 
-    audio_data = np.array(recording, dtype=np.int16)
+    audio_data = recording.view()
     print("Recording finished. Size:", audio_data.size) if config[
         "print_to_terminal"
     ] else ""
 
-    # Save the recorded audio as a temporary WAV file on disk
-    with tempfile.NamedTemporaryFile(
-        suffix=".wav", delete=False
-    ) as temp_audio_file:
-        with wave.open(temp_audio_file.name, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)  # 2 bytes (16 bits) per sample
-            wf.setframerate(sample_rate)
-            wf.writeframes(audio_data.tobytes())
-        fw(temp_audio_file.name)
-        os.remove(temp_audio_file.name)
-    return ''
+    return FasterWhisperEngine(config).transcribe(audio_data)
 
 
 def on_shortcut():
@@ -153,16 +103,9 @@ config = load_config_with_defaults()
 
 
 def fw(waveform: np.ndarray | str):
-    # model_size_or_path: Size of the model to use (tiny, tiny.en, base, base.en,
-    #  small, small.en, medium, medium.en, large-v1, large-v2, or large), a path to a converted
-    #  model directory, or a CTranslate2-converted Whisper model ID from the Hugging Face Hub.
-    #  When a size or a model ID is configured, the converted model is downloaded
-    #  from the Hugging Face Hub.
     logger.debug("Starting fw")
-    model_size = "small.en"
-    # or run on CPU with INT8
-    # model = WhisperModel(model_size, device="cpu", compute_type="int8")
-    model = WhisperModel(model_size)
+    # Uses the model, device and compute_type from faster_whisper_options
+    model = FasterWhisperEngine(config).load_model()
 
     segments, info = model.transcribe(waveform, language="en", vad_filter=True)
 
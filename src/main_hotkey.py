@@ -1,4 +1,3 @@
-import json
 import os
 import queue
 import threading
@@ -6,7 +5,8 @@ import threading
 import keyboard
 import pyautogui
 
-from status_window import StatusWindow
+from config import load_config_with_defaults
+from status_window import StatusQueue, StatusWindow
 from transcription import record_and_transcribe
 
 msg_queue = queue.Queue()
@@ -27,44 +27,6 @@ class ResultThread(threading.Thread):
         self.stop_transcription = True
 
 
-def load_config_with_defaults():
-    default_config = {
-        "use_api": True,
-        "api_options": {
-            "model": "whisper-1",
-            "language": None,
-            "temperature": 0.0,
-            "initial_prompt": None,
-        },
-        "local_model_options": {
-            "model": "base",
-            "device": None,
-            "language": None,
-            "temperature": 0.0,
-            "initial_prompt": None,
-            "condition_on_previous_text": True,
-            "verbose": False,
-        },
-        "activation_key": "ctrl+alt+space",
-        "silence_duration": 900,
-        "writing_key_press_delay": 0.008,
-        "remove_trailing_period": True,
-        "add_trailing_space": False,
-        "remove_capitalization": False,
-        "print_to_terminal": True,
-    }
-
-    config_path = os.path.join("src", "config.json")
-    if os.path.isfile(config_path):
-        with open(config_path, "r") as config_file:
-            user_config = json.load(config_file)
-            for key, value in user_config.items():
-                if key in default_config and value is not None:
-                    default_config[key] = value
-
-    return default_config
-
-
 def clear_status_queue():
     while not status_queue.empty():
         try:
@@ -81,15 +43,11 @@ def on_shortcut():
     recording_thread = ResultThread(
         target=record_and_transcribe, args=(status_queue,), kwargs={"config": config}
     )
-    status_window = StatusWindow(status_queue)
     status_window.recording_thread = recording_thread
-    status_window.start()
     recording_thread.start()
 
     recording_thread.join()
-
-    if status_window.is_alive():
-        status_queue.put(("cancel", ""))
+    status_queue.put(("idle", ""))
 
     transcribed_text = recording_thread.result
 
@@ -102,31 +60,33 @@ def format_keystrokes(key_string):
 
 
 # Main script
+if __name__ == "__main__":
+    config = load_config_with_defaults()
+    method = "OpenAI's API" if config["use_api"] else "a local model"
+    status_queue = StatusQueue()
+    status_window = StatusWindow(status_queue)
+    status_window.start()
+
+    keyboard.add_hotkey(config["activation_key"], on_shortcut)
+
+    print(
+        f'Script activated. Whisper is set to run using {method}. To change this, modify the "use_api" value in the src\\config.json file.'
+    )
+    print(
+        f'Press {format_keystrokes(config["activation_key"])} to start recording and transcribing. Press Ctrl+C on the terminal window to quit.'
+    )
 
-config = load_config_with_defaults()
-method = "OpenAI's API" if config["use_api"] else "a local model"
-status_queue = queue.Queue()
-
-keyboard.add_hotkey(config["activation_key"], on_shortcut)
-
-print(
-    f'Script activated. Whisper is set to run using {method}. To change this, modify the "use_api" value in the src\\config.json file.'
-)
-print(
-    f'Press {format_keystrokes(config["activation_key"])} to start recording and transcribing. Press Ctrl+C on the terminal window to quit.'
-)
-
-try:
-    while True:
-        msg = msg_queue.get()
-        match msg:
-            case "start":
-                on_shortcut()
-            case "stop":
-                on_shortcut()
-            case _:
-                print("Unknown message")
-        # keyboard.wait()  # Keep the script running to listen for the shortcut
-except KeyboardInterrupt:
-    print("\nExiting the script...")
-    os.system("exit")
+    try:
+        while True:
+            msg = msg_queue.get()
+            match msg:
+                case "start":
+                    on_shortcut()
+                case "stop":
+                    on_shortcut()
+                case _:
+                    print("Unknown message")
+            # keyboard.wait()  # Keep the script running to listen for the shortcut
+    except KeyboardInterrupt:
+        print("\nExiting the script...")
+        os.system("exit")
@@ -1,167 +1,229 @@
+"""
+Transcription server.
+
+Clients talk to a ROUTER socket, so any number of them can be served at once and a slow
+recording doesn't hold up anyone else. Every request is [*routing frames, b"", command,
+*payload]: a REQ client adds the empty delimiter itself, and a DEALER client can send its own
+request ID as a routing frame ([request_id, b"", command]) to have several requests in flight.
+Replies come back with the same routing frames whenever the job finishes.
+
+Commands:
+    start               record from the microphone until the speaker stops and reply with the text
+    transcribe <pcm>    transcribe the 16 kHz mono int16 samples in the next frame; requests
+                        arriving close together are batched if "batching" is enabled
+    cancel              stop the recording in progress
+    jobs                JSON list of the jobs that are queued or running
+    stats [prometheus]  latency metrics as JSON, or in the Prometheus text format
+    echo <text>         reply with text
+    test                reply with "hello, world"
+    exit                stop the server
+"""
+
+import asyncio
+import itertools
 import json
 import os
 import queue
-import threading
-import time
+from concurrent.futures import ThreadPoolExecutor
 
-import keyboard
+import numpy as np
 import zmq
-
-from status_window import StatusWindow
-from transcription import record_and_transcribe
-
-# def on_shortcut():
-#     global status_queue
-#     clear_status_queue()
-#
-#     status_queue.put(('recording', 'Recording...'))
-#     recording_thread = ResultThread(target=record_and_transcribe, args=(status_queue,), kwargs={'config': config})
-#     recording_thread.start()
-#
-#     recording_thread.join()
-#     status_queue.put(('cancel', ''))
-#
-#     transcribed_text = recording_thread.result
-#     print(transcribed_text)
-#
-#     # if transcribed_text:
-#     #     pyautogui.write(transcribed_text, interval=config['writing_key_press_delay'])
-
-
-# keyboard.add_hotkey(config['activation_key'], on_shortcut)
-# keyboard.add_hotkey('F13', on_shortcut)
-
-
-class ResultThread(threading.Thread):
-    def __init__(self, *args, **kwargs):
-        super(ResultThread, self).__init__(*args, **kwargs)
-        self.result = None
-        self.stop_transcription = False
-
-    def run(self):
-        self.result = self._target(
-            *self._args, cancel_flag=lambda: self.stop_transcription, **self._kwargs
+import zmq.asyncio
+from loguru import logger
+
+from batching import BatchScheduler
+from config import load_config_with_defaults
+from engines import get_engine
+from metrics import SessionTimer, metrics, record_session
+from model_cache import model_cache
+from result_cache import get_result_cache
+from transcription import (
+    preload_backend,
+    process_transcription,
+    record_and_transcribe,
+    transcribe_audio,
+)
+
+
+class Job:
+    ids = itertools.count(1)
+
+    def __init__(self, envelope, command, payload):
+        self.id = next(Job.ids)
+        self.envelope = envelope
+        self.command = command
+        self.payload = payload
+        self.cancelled = False
+
+    def describe(self):
+        return {"id": self.id, "command": self.command, "cancelled": self.cancelled}
+
+
+class TranscriptionServer:
+    def __init__(self, config, address):
+        self.config = config
+        self.context = zmq.asyncio.Context()
+        self.socket = self.context.socket(zmq.ROUTER)
+        self.socket.bind(address)
+        # There is one microphone, so recordings run one at a time in order
+        self.recordings = asyncio.Queue()
+        self.current_recording = None
+        self.jobs = {}
+        # The recording gets a thread of its own, so queued transcribe requests never hold up
+        # capturing audio
+        self.recording_executor = ThreadPoolExecutor(1, thread_name_prefix="recording")
+        self.executor = ThreadPoolExecutor(
+            config["server"]["transcribe_workers"], thread_name_prefix="transcribe"
+        )
+        self.stopped = asyncio.Event()
+        # Transcribe requests that arrive close together are decoded as one batch
+        self.batcher = None
+        if config["batching"]["enabled"]:
+            self.batcher = BatchScheduler.from_config(get_engine(config), config)
+
+    async def reply(self, envelope, *frames):
+        await self.socket.send_multipart(
+            [*envelope, *(f.encode("utf-8") if isinstance(f, str) else f for f in frames)]
         )
 
-    def stop(self):
-        self.stop_transcription = True
-
-
-def load_config_with_defaults():
-    default_config = {
-        "use_api": True,
-        "api_options": {
-            "model": "whisper-1",
-            "language": None,
-            "temperature": 0.0,
-            "initial_prompt": None,
-        },
-        "local_model_options": {
-            "model": "base",
-            "device": None,
-            "language": None,
-            "temperature": 0.0,
-            "initial_prompt": None,
-            "condition_on_previous_text": True,
-            "verbose": False,
-        },
-        "activation_key": "ctrl+alt+space",
-        "silence_duration": 900,
-        "writing_key_press_delay": 0.008,
-        "remove_trailing_period": True,
-        "add_trailing_space": False,
-        "remove_capitalization": False,
-        "print_to_terminal": True,
-    }
-
-    config_path = os.path.join("src", "config.json")
-    if os.path.isfile(config_path):
-        with open(config_path, "r") as config_file:
-            user_config = json.load(config_file)
-            for key, value in user_config.items():
-                if key in default_config and value is not None:
-                    default_config[key] = value
-
-    return default_config
-
-
-def clear_status_queue():
-    while not status_queue.empty():
-        try:
-            status_queue.get_nowait()
-        except queue.Empty:
-            break
-
-
-def on_shortcut():
-    global status_queue
-
-    recording_thread = ResultThread(
-        target=record_and_transcribe, args=(status_queue,), kwargs={"config": config}
-    )
-    recording_thread.start()
-
-    recording_thread.join()
-
-    status_queue.put(("cancel", ""))
-
-    transcribed_text = recording_thread.result
-    print(f"Transcribed text: {transcribed_text}")
-    socket.send_string(transcribed_text)
-
-
-def format_keystrokes(key_string):
-    return "+".join(word.capitalize() for word in key_string.split("+"))
-
-
-config = load_config_with_defaults()
-method = "OpenAI's API" if config["use_api"] else "a local model"
-status_queue = queue.Queue()
-
-# keyboard.add_hotkey("F13", on_shortcut)
-
-# print(
-#     f'Script activated. Whisper is set to run using {method}. To change this, modify the "use_api" value in the src\\config.json file.'
-# )
-# print(
-#     f'Press {format_keystrokes(config["activation_key"])} to start recording and transcribing. Press Ctrl+C on the terminal window to quit.'
-# )
-
-
-context = zmq.Context()
-socket = context.socket(zmq.REP)
-socket.bind("tcp://*:5555")
-print("Server started")
-
-
-def main():
-    while True:
-        #  Wait for next request from client
-        message = socket.recv().decode("utf-8")
-        print(f"Received request: {message}")
-
-        # TODO: elaborate
-        # match message.split():
-
-        match message.split(" ")[0]:
+    async def serve(self):
+        tasks = [
+            asyncio.create_task(self.receive_loop()),
+            asyncio.create_task(self.recording_loop()),
+        ]
+        await self.stopped.wait()
+        for task in tasks:
+            task.cancel()
+        self.recording_executor.shutdown(wait=False, cancel_futures=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.socket.close(linger=100)
+
+    async def receive_loop(self):
+        while True:
+            frames = await self.socket.recv_multipart()
+            if b"" not in frames:
+                logger.warning(f"Dropping request without a delimiter frame: {frames!r}")
+                continue
+            delimiter = frames.index(b"")
+            envelope = frames[: delimiter + 1]
+            if len(frames) <= delimiter + 1:
+                await self.reply(envelope, "Missing command")
+                continue
+            message = frames[delimiter + 1].decode("utf-8")
+            payload = frames[delimiter + 2 :]
+            print(f"Received request: {message}")
+            await self.handle(envelope, message, payload)
+
+    async def handle(self, envelope, message, payload):
+        command, _, argument = message.partition(" ")
+        match command:
             case "start":
-                on_shortcut()
-            # case "start":
-            #     on_shortcut()
+                job = self.add_job(envelope, command, payload)
+                await self.recordings.put(job)
+            case "transcribe":
+                if not payload:
+                    await self.reply(envelope, "Missing audio frame")
+                    return
+                job = self.add_job(envelope, command, payload)
+                asyncio.create_task(self.run_job(job, self.transcribe(job)))
+            case "cancel":
+                if self.current_recording:
+                    self.current_recording.cancelled = True
+                await self.reply(envelope, "cancelled" if self.current_recording else "idle")
+            case "jobs":
+                jobs = [job.describe() for job in self.jobs.values()]
+                await self.reply(envelope, json.dumps(jobs))
+            case "stats":
+                # "stats prometheus" returns the Prometheus text format instead of JSON
+                if argument == "prometheus":
+                    await self.reply(envelope, metrics.to_prometheus())
+                else:
+                    stats = {"stages": metrics.snapshot(), "model_cache": model_cache.stats()}
+                    if self.batcher:
+                        stats["batching"] = self.batcher.stats()
+                    if get_result_cache(self.config):
+                        stats["result_cache"] = get_result_cache(self.config).stats()
+                    await self.reply(envelope, json.dumps(stats))
             case "echo":
-                socket.send_string(message.split(" ")[1])
+                await self.reply(envelope, argument)
             case "test":
-                socket.send_string("hello, world")
+                await self.reply(envelope, "hello, world")
             case "exit":
-                socket.send_string("exit")
-                break
+                await self.reply(envelope, "exit")
+                self.stopped.set()
             case _:
-                socket.send_string("Please send either 'Hello' or 'World'")
+                await self.reply(envelope, f"Unknown command {command!r}")
+
+    def add_job(self, envelope, command, payload):
+        job = Job(envelope, command, payload)
+        self.jobs[job.id] = job
+        logger.debug(f"Queued job {job.id}: {command}")
+        return job
+
+    def in_executor(self, function, *args, executor=None):
+        return asyncio.get_running_loop().run_in_executor(
+            executor or self.executor, function, *args
+        )
+
+    async def run_job(self, job, work):
+        try:
+            text = await work
+        except Exception as e:
+            logger.exception(f"Job {job.id} failed")
+            text = f"Error: {e}"
+        finally:
+            del self.jobs[job.id]
+        await self.reply(job.envelope, text or "")
+
+    async def recording_loop(self):
+        while True:
+            job = await self.recordings.get()
+            self.current_recording = job
+            try:
+                await self.run_job(
+                    job, self.in_executor(self.record, job, executor=self.recording_executor)
+                )
+            finally:
+                self.current_recording = None
+
+    def record(self, job):
+        session = SessionTimer()
+        session.mark("hotkey")
+        text = record_and_transcribe(
+            queue.Queue(), lambda: job.cancelled, config=self.config, session=session
+        )
+        print(f"Transcribed text: {text}")
+        record_session(session, self.config)
+        return text
+
+    async def transcribe(self, job):
+        audio_data = np.frombuffer(job.payload[0], dtype=np.int16)
+        if self.batcher:
+            # Clients retrying after a timeout get the cached text instead of a second decode
+            cache = get_result_cache(self.config)
+            key = cache.key(audio_data, 16000, self.batcher.engine) if cache else None
+            text = cache.get(key) if cache else None
+            if text is None:
+                text = await asyncio.wrap_future(self.batcher.submit(audio_data))
+                if cache:
+                    cache.put(key, text)
+        else:
+            text = await self.in_executor(transcribe_audio, audio_data, 16000, self.config)
+        return process_transcription(text.strip(), self.config) if text else ""
+
+
+async def main():
+    config = load_config_with_defaults()
+    server = TranscriptionServer(config, config["server"]["address"])
+    print("Server started")
+    # Load the model before the first request needs it
+    asyncio.get_running_loop().run_in_executor(server.executor, preload_backend, config)
+    await server.serve()
 
 
 if __name__ == "__main__":
     try:
-        main()
+        asyncio.run(main())
     except KeyboardInterrupt:
         print("\nExiting the script...")
         os.system("exit")
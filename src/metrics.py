@@ -0,0 +1,130 @@
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Stages of a dictation session, in the order they happen
+STAGES = (
+    "hotkey",
+    "stream_opened",
+    "first_speech",
+    "endpoint",
+    "audio_encoded",
+    "inference_start",
+    "inference_end",
+    "injection_start",
+    "injection_end",
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class SessionTimer:
+    """Monotonic timestamps for the stages of one dictation session."""
+
+    def __init__(self):
+        self.marks = {}
+
+    def mark(self, stage):
+        # Keep the first time a stage is reached, e.g. the first speech frame
+        self.marks.setdefault(stage, time.monotonic())
+
+    def durations(self):
+        """
+        Seconds spent reaching each stage from the previous one that was reached, plus the time
+        from the end of speech to the text being injected and the session total.
+        """
+        reached = [stage for stage in STAGES if stage in self.marks]
+        durations = {
+            stage: self.marks[stage] - self.marks[previous]
+            for previous, stage in zip(reached, reached[1:])
+        }
+        if "endpoint" in self.marks and len(reached) > 1:
+            durations["post_speech"] = self.marks[reached[-1]] - self.marks["endpoint"]
+        if len(reached) > 1:
+            durations["total"] = self.marks[reached[-1]] - self.marks[reached[0]]
+        return durations
+
+
+class Histogram:
+    """Latency distribution over the most recent observations, plus all-time count and sum."""
+
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self):
+        if not self.samples:
+            return {q: None for q in QUANTILES}
+        values = np.quantile(np.fromiter(self.samples, dtype=float), QUANTILES)
+        return dict(zip(QUANTILES, values.tolist()))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self.stages.setdefault(stage, Histogram()).observe(seconds)
+
+    def record_session(self, session):
+        for stage, seconds in session.durations().items():
+            self.observe(stage, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                stage: {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    **{f"p{round(q * 100)}": value for q, value in histogram.quantiles().items()},
+                }
+                for stage, histogram in self.stages.items()
+            }
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP whisperwriter_stage_seconds Time spent in each stage of a dictation session.",
+            "# TYPE whisperwriter_stage_seconds summary",
+        ]
+        with self._lock:
+            for stage, histogram in self.stages.items():
+                for q, value in histogram.quantiles().items():
+                    if value is not None:
+                        lines.append(
+                            f'whisperwriter_stage_seconds{{stage="{stage}",quantile="{q}"}} {value}'
+                        )
+                lines.append(f'whisperwriter_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(
+                    f'whisperwriter_stage_seconds_count{{stage="{stage}"}} {histogram.count}'
+                )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically write the metrics file, e.g. for the node_exporter textfile collector."""
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as metrics_file:
+            metrics_file.write(self.to_prometheus())
+        # NamedTemporaryFile is only readable by its owner; the collector may run as another user
+        os.chmod(metrics_file.name, 0o644)
+        os.replace(metrics_file.name, path)
+
+
+metrics = MetricsRegistry()
+
+
+def record_session(session, config):
+    metrics.record_session(session)
+    prometheus_file = (config.get("metrics") or {}).get("prometheus_file")
+    if prometheus_file:
+        metrics.write_prometheus(prometheus_file)
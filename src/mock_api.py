@@ -0,0 +1,77 @@
+"""
+A stand-in for the OpenAI transcription endpoint, for testing the API engine offline.
+
+Run it and point the API engine at it with "api_base": "http://localhost:8000/v1":
+
+    python src/mock_api.py --latency 0.3 --jitter 0.5 --error-rate 0.1
+
+Every POST to /v1/audio/transcriptions is answered after the given latency (plus a random
+extra delay of up to --jitter seconds) with a JSON body naming the uploaded file, or with a
+503 error for the given fraction of requests.
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockTranscriptionHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open, like the real endpoint
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_HEAD(self):
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.rstrip("/") != "/v1/audio/transcriptions":
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        if random.random() < self.error_rate:
+            self.send_json(503, {"error": {"message": "Mock server error"}})
+            return
+        match = re.search(rb'filename="([^"]*)"', body)
+        filename = match.group(1).decode("utf-8") if match else "no file"
+        self.send_json(200, {"text": f"Mock transcription of {filename} ({len(body)} bytes)."})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 503 replies")
+    args = parser.parse_args()
+
+    MockTranscriptionHandler.latency = args.latency
+    MockTranscriptionHandler.jitter = args.jitter
+    MockTranscriptionHandler.error_rate = args.error_rate
+    server = ThreadingHTTPServer((args.host, args.port), MockTranscriptionHandler)
+    print(f"Mock transcription API listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
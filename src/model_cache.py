@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+
+from loguru import logger
+
+
+class ModelCache:
+    """
+    Process-wide registry of loaded models keyed by (engine, model name, device, compute_type).
+
+    Each model is loaded once and kept resident. When more than max_resident models are loaded
+    the least recently used one is dropped, and models that have not been used for idle_timeout
+    seconds are unloaded by a background thread so their memory is returned.
+    """
+
+    def __init__(self, max_resident=2, idle_timeout=None):
+        self.max_resident = max_resident
+        self.idle_timeout = idle_timeout
+        self._models = OrderedDict()  # key -> [model, last_used]
+        self._loading = {}  # key -> threading.Event set once the load finishes
+        self._lock = threading.Lock()
+        self._reaper = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+        self._load_times = {}  # key -> seconds the last load of that model took
+
+    def configure(self, max_resident=None, idle_timeout=None):
+        with self._lock:
+            if max_resident is not None:
+                self.max_resident = max(1, max_resident)
+            self.idle_timeout = idle_timeout
+            self._evict_over_capacity()
+        self._start_reaper()
+
+    def get(self, key, loader):
+        """Return the model for key, calling loader() to load it only if it is not resident."""
+        while True:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    entry[1] = time.monotonic()
+                    self._models.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+
+                pending = self._loading.get(key)
+                if pending is None:
+                    # This thread loads the model; anyone else asking for it waits below
+                    pending = self._loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            pending.wait()
+
+        try:
+            start = time.perf_counter()
+            model = loader()
+            elapsed = time.perf_counter() - start
+            logger.debug(f"Loaded model {key} in {elapsed:.2f}s")
+
+            with self._lock:
+                self.load_seconds += elapsed
+                self._load_times[key] = elapsed
+                self._models[key] = [model, time.monotonic()]
+                self._evict_over_capacity()
+            return model
+        finally:
+            with self._lock:
+                del self._loading[key]
+            pending.set()
+
+    def unload(self, key):
+        with self._lock:
+            return self._models.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def resident(self):
+        with self._lock:
+            return list(self._models)
+
+    def load_times(self):
+        """Seconds the most recent load of each model that has been loaded took, by key."""
+        with self._lock:
+            return dict(self._load_times)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "load_seconds": self.load_seconds,
+                "resident": len(self._models),
+            }
+
+    def _evict_over_capacity(self):
+        # Caller holds self._lock
+        while len(self._models) > self.max_resident:
+            key, _ = self._models.popitem(last=False)
+            self.evictions += 1
+            logger.debug(f"Evicted model {key}")
+
+    def _evict_idle(self):
+        if not self.idle_timeout:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for key, (_, last_used) in list(self._models.items()):
+                if now - last_used >= self.idle_timeout:
+                    del self._models[key]
+                    self.evictions += 1
+                    logger.debug(f"Unloaded idle model {key}")
+
+    def _start_reaper(self):
+        if not self.idle_timeout or (self._reaper and self._reaper.is_alive()):
+            return
+        self._reaper = threading.Thread(target=self._reap, daemon=True)
+        self._reaper.start()
+
+    def _reap(self):
+        while self.idle_timeout:
+            time.sleep(min(self.idle_timeout, 30))
+            self._evict_idle()
+
+
+model_cache = ModelCache()
+
+
+def configure_model_cache(config):
+    options = (config.get("model_cache") if config else None) or {}
+    model_cache.configure(
+        max_resident=options.get("max_resident"), idle_timeout=options.get("idle_timeout")
+    )
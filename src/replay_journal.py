@@ -0,0 +1,112 @@
+"""
+Replay journaled dictations through a transcription engine.
+
+Each recording in the journal (see journal.py) is memory-mapped from its segment file and
+transcribed directly, without the microphone, the VAD or decoding a file. The report compares
+every recording with what it was journaled with: the inference time against the latency at the
+time, and the text by its word error rate against the journaled text. Run it from the repository
+root:
+
+    python src/replay_journal.py journal --engine faster-whisper:small.en --output replay.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from benchmark import git_commit, summarize, word_error_rate
+from journal import UtteranceJournal
+
+
+def replay(journal, entries, config):
+    from engines import get_engine
+    from transcription import transcribe_audio
+
+    engine = get_engine(config)
+    engine.preload()
+
+    runs = []
+    for done, entry in enumerate(entries, 1):
+        samples = journal.read(entry)
+        audio_seconds = len(samples) / entry["sample_rate"]
+        start = time.perf_counter()
+        text = transcribe_audio(samples, entry["sample_rate"], config)
+        inference_seconds = time.perf_counter() - start
+        runs.append(
+            {
+                "time": entry["time"],
+                "audio_seconds": audio_seconds,
+                "journaled_engine": entry["engine"],
+                "journaled_model": entry["model"],
+                "journaled_latency_seconds": entry["latency"],
+                "inference_seconds": inference_seconds,
+                "real_time_factor": inference_seconds / audio_seconds if audio_seconds else None,
+                "journaled_text": entry["text"],
+                "text": text,
+                "word_error_rate": word_error_rate(entry["text"], text or ""),
+            }
+        )
+        print(f"\r{done}/{len(entries)} recordings", end="", file=sys.stderr)
+    print(file=sys.stderr)
+
+    return {
+        "engine": engine.name,
+        "model": engine.model_name,
+        "summary": {
+            key: summarize(runs, key)
+            for key in (
+                "journaled_latency_seconds",
+                "inference_seconds",
+                "real_time_factor",
+                "word_error_rate",
+            )
+        },
+        "runs": runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "directory", nargs="?", help="journal directory (default: the configured one)"
+    )
+    parser.add_argument("--engine", help="engine[:model] to use (default: the configured engine)")
+    parser.add_argument("--preset", help="decoding preset to use with a local engine")
+    parser.add_argument("--limit", type=int, help="replay only the most recent LIMIT recordings")
+    parser.add_argument("--config", help="JSON object of config values to override")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    from config import load_tool_config
+
+    overrides = json.loads(args.config) if args.config else {}
+    config = load_tool_config(overrides, args.engine, args.preset)
+    config["print_to_terminal"] = False
+    # Replaying the journal would otherwise measure cache lookups, not the engine
+    config["result_cache"]["enabled"] = False
+    config["inference_workers"]["processes"] = 0
+
+    journal = UtteranceJournal(args.directory or config["journal"]["directory"])
+    entries = journal.entries()
+    if args.limit:
+        entries = entries[-args.limit :]
+    if not entries:
+        parser.error(f"no recordings in the journal at {journal.directory}")
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "journal": journal.directory,
+        "result": replay(journal, entries, config),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class PolyphaseResampler:
+    """
+    Converts a stream of int16 blocks from one sample rate to another, e.g. from a microphone's
+    native 48 kHz to the 16 kHz the models expect.
+
+    The low-pass filter is split into `up` phases, so each output sample costs one short dot
+    product over the input instead of filtering an upsampled signal. The filter history and the
+    position of the next output sample carry over from one block to the next, so blocks of any
+    size give the same output as resampling the whole recording at once.
+    """
+
+    def __init__(self, input_rate, output_rate=16000, zero_crossings=16, rolloff=0.9, beta=8.0):
+        divisor = gcd(int(input_rate), int(output_rate))
+        self.up = int(output_rate) // divisor
+        self.down = int(input_rate) // divisor
+
+        # Windowed-sinc low-pass at the lower of the two Nyquist frequencies, at the upsampled rate
+        ratio = max(self.up, self.down)
+        num_taps = 2 * zero_crossings * ratio + 1
+        cutoff = rolloff / (2 * ratio)
+        t = np.arange(num_taps) - (num_taps - 1) / 2
+        taps = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(num_taps, beta) * self.up
+
+        # phases[p, i] is the tap applied to the input sample i samples back, for output phase p
+        self.taps_per_phase = -(-num_taps // self.up)
+        padded = np.zeros(self.taps_per_phase * self.up)
+        padded[:num_taps] = taps
+        phases = padded.reshape(self.taps_per_phase, self.up).T
+        # Reversed so a window of input in time order lines up with the taps
+        self._phases = np.ascontiguousarray(phases[:, ::-1], dtype=np.float32)
+
+        self._history = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        # Position of the next output sample, in upsampled samples from the start of the next block
+        self._next = 0
+
+    def process(self, block):
+        """Resample one block of int16 samples and return the int16 samples it completes."""
+        if self.up == self.down:
+            return block
+        samples = np.concatenate([self._history, block.astype(np.float32)])
+        limit = len(block) * self.up
+        positions = np.arange(self._next, limit, self.down)
+        self._next = (positions[-1] + self.down - limit) if len(positions) else self._next - limit
+        if len(self._history):
+            self._history = samples[-len(self._history) :]
+        if not len(positions):
+            return np.zeros(0, dtype=np.int16)
+
+        # Window n ends at block sample n, the latest input each output depends on
+        windows = sliding_window_view(samples, self.taps_per_phase)[positions // self.up]
+        output = np.einsum("ij,ij->i", self._phases[positions % self.up], windows)
+        return np.clip(np.rint(output), -32768, 32767).astype(np.int16)
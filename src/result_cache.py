@@ -0,0 +1,174 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from loguru import logger
+
+
+class ResultCache:
+    """
+    Transcriptions keyed by a hash of the samples and everything else that affects the text: the
+    engine, its model, options and decoding preset, the sample rate and the prompt.
+
+    Recent results are kept in memory (least recently used first out). With a directory set,
+    every result is also written there as a small text file, so replays and re-runs hit the cache
+    across restarts; the least recently used files are deleted once they take up more than
+    max_disk_size bytes.
+    """
+
+    def __init__(self, max_entries=1000, directory=None, max_disk_size=100 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_size = max_disk_size
+        self._entries = OrderedDict()  # key -> text
+        self._lock = threading.Lock()
+        self._disk_size = self._scan_disk() if directory else 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(audio_data, sample_rate, engine, prompt=None):
+        description = json.dumps(
+            [engine.cache_identity(), sample_rate, prompt],
+            sort_keys=True,
+            default=str,
+        )
+        digest = hashlib.blake2b(description.encode("utf-8"), digest_size=16)
+        digest.update(audio_data.tobytes())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached text for key, or None."""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return text
+
+        text = self._read(key) if self.directory else None
+        with self._lock:
+            if text is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, text)
+        return text
+
+    def put(self, key, text):
+        if text is None:
+            return
+        with self._lock:
+            self._remember(key, text)
+        if self.directory:
+            self._write(key, text)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "disk_size": self._disk_size,
+            }
+
+    def _remember(self, key, text):
+        # Caller holds self._lock
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.txt")
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                text = file.read()
+        except FileNotFoundError:
+            return None
+        # The modification time orders files for eviction, so a hit counts as a use
+        os.utime(path)
+        return text
+
+    def _write(self, key, text):
+        path = self._path(key)
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # An overwritten result no longer takes up its old size
+            previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                file.write(text)
+            os.replace(temporary_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            # The text is still returned and kept in memory; only the copy on disk is lost
+            logger.warning(f"Could not save a result to {self.directory}: {e}")
+            with contextlib.suppress(OSError):
+                os.remove(temporary_path)
+            return
+        with self._lock:
+            self._disk_size += size - previous_size
+            over_capacity = self._disk_size > self.max_disk_size
+        if over_capacity:
+            self._evict_disk()
+
+    def _scan_disk(self):
+        return sum(size for _, _, size in self._disk_files())
+
+    def _disk_files(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".txt"):
+                    stat = os.stat(os.path.join(root, name))
+                    files.append((stat.st_mtime, os.path.join(root, name), stat.st_size))
+        return files
+
+    def _evict_disk(self):
+        # Delete down to 90% of the limit so the next few writes don't each trigger a scan
+        files = sorted(self._disk_files())
+        size = sum(file_size for _, _, file_size in files)
+        for _, path, file_size in files:
+            if size <= 0.9 * self.max_disk_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            size -= file_size
+        with self._lock:
+            self._disk_size = size
+        logger.debug(f"Result cache on disk trimmed to {size} bytes")
+
+
+result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache(config):
+    """The process-wide result cache, or None if it is disabled."""
+    global result_cache
+    options = config["result_cache"]
+    if not options["enabled"]:
+        return None
+    with _result_cache_lock:
+        if result_cache is None:
+            result_cache = ResultCache(
+                max_entries=options["max_entries"],
+                directory=options["directory"],
+                max_disk_size=options["max_disk_size"] * 1024 * 1024,
+            )
+        return result_cache
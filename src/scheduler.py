@@ -0,0 +1,145 @@
+import json
+import os
+import tempfile
+import threading
+
+from loguru import logger
+
+from model_cache import model_cache
+
+# Starting guesses for seconds of inference per second of audio on a CPU, used only until a
+# model has been measured
+DEFAULT_REAL_TIME_FACTORS = {"tiny": 0.05, "base": 0.1, "small": 0.3, "medium": 0.8, "large": 1.6}
+# Starting guesses for the seconds it takes to load a model, used until it has been loaded once
+DEFAULT_LOAD_SECONDS = {"tiny": 1.0, "base": 1.5, "small": 4.0, "medium": 10.0, "large": 20.0}
+
+
+class ModelScheduler:
+    """
+    Picks the model for each utterance so that transcribing it fits in a latency budget.
+
+    The inference time of a model is estimated as its real-time factor (seconds of inference per
+    second of audio) times the length of the utterance. Real-time factors are exponentially
+    weighted moving averages of what each model actually took, updated after every utterance
+    and optionally kept in a file between runs. The largest model expected to finish within
+    target_latency is chosen. The estimate for a model that is not loaded includes the time to
+    load it, and such a model is only chosen when no loaded model fits, since loading it evicts
+    another. If no model fits at all, the one with the lowest estimate is used.
+    """
+
+    def __init__(self, models, target_latency=1.0, state_file=None, smoothing=0.2):
+        # Ordered from fastest to most accurate
+        self.models = list(models)
+        self.target_latency = target_latency
+        self.state_file = state_file
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self.real_time_factors = self._load_state()
+
+    @classmethod
+    def from_config(cls, config):
+        options = config["model_scheduler"]
+        return cls(
+            options["models"],
+            target_latency=options["target_latency"] / 1000,
+            state_file=options["state_file"],
+        )
+
+    def real_time_factor(self, model):
+        with self._lock:
+            if model in self.real_time_factors:
+                return self.real_time_factors[model]
+        # "small.en" and "small" run at the same speed
+        return DEFAULT_REAL_TIME_FACTORS.get(model.split(".")[0], 1.0)
+
+    def choose(
+        self, audio_seconds, is_resident=lambda model: True, load_seconds=lambda model: None
+    ):
+        """
+        Return the model to transcribe audio_seconds of audio with, and log why. load_seconds
+        gives how long a model took to load last time, or None if it hasn't been loaded yet.
+        """
+        resident = [model for model in self.models if is_resident(model)]
+        estimates = {}
+        for model in self.models:
+            estimates[model] = self.real_time_factor(model) * audio_seconds
+            if model not in resident:
+                load = load_seconds(model)
+                if load is None:
+                    load = DEFAULT_LOAD_SECONDS.get(model.split(".")[0], 10.0)
+                estimates[model] += load
+        fitting = [model for model in self.models if estimates[model] <= self.target_latency]
+        fitting_resident = [model for model in fitting if model in resident]
+        if fitting_resident or fitting:
+            choice = (fitting_resident or fitting)[-1]
+        else:
+            choice = min(self.models, key=estimates.get)
+        logger.info(
+            f"Scheduler: {audio_seconds:.1f}s of audio, budget {self.target_latency:.2f}s, "
+            f"estimates {', '.join(f'{m}={estimates[m]:.2f}s' for m in self.models)}, "
+            f"loaded {resident or 'none'}, chose {choice}"
+            + ("" if fitting else " (nothing fits the budget)")
+        )
+        return choice
+
+    def observe(self, model, audio_seconds, inference_seconds):
+        """Update the model's real-time factor with a measured transcription."""
+        if audio_seconds <= 0:
+            return
+        measured = inference_seconds / audio_seconds
+        previous = self.real_time_factor(model)
+        with self._lock:
+            if model in self.real_time_factors:
+                measured = previous + self.smoothing * (measured - previous)
+            self.real_time_factors[model] = measured
+            state = dict(self.real_time_factors)
+        logger.debug(f"Real-time factor of {model}: {previous:.3f} -> {measured:.3f}")
+        if self.state_file:
+            self._save_state(state)
+
+    def _load_state(self):
+        if not self.state_file or not os.path.isfile(self.state_file):
+            return {}
+        with open(self.state_file, "r") as state_file:
+            return json.load(state_file)
+
+    def _save_state(self, state):
+        directory = os.path.dirname(os.path.abspath(self.state_file))
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as state_file:
+            json.dump(state, state_file, indent=2)
+        os.replace(state_file.name, self.state_file)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(config):
+    """The process-wide scheduler, or None if it is disabled."""
+    global _scheduler
+    if not config["model_scheduler"]["enabled"]:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ModelScheduler.from_config(config)
+        return _scheduler
+
+
+def scheduled_config(config, scheduler, audio_seconds):
+    """A copy of config whose local engine uses the model the scheduler picks for the utterance."""
+    from engines import get_engine
+
+    engine = get_engine(config)
+    options = engine.options
+
+    def is_resident(model):
+        return any(key[:2] == (engine.name, model) for key in model_cache.resident())
+
+    def load_seconds(model):
+        times = [
+            t for key, t in model_cache.load_times().items() if key[:2] == (engine.name, model)
+        ]
+        return max(times) if times else None
+
+    model = scheduler.choose(audio_seconds, is_resident, load_seconds)
+    return {**config, engine.options_key: {**options, "model": model}}
@@ -1,4 +1,3 @@
-import gc
 import os
 import queue
 import threading
@@ -7,22 +6,52 @@ import tkinter as tk
 from PIL import Image, ImageTk
 
 
+class StatusQueue(queue.Queue):
+    """A queue of (status, text) updates that wakes the status window whenever one is added."""
+
+    def __init__(self):
+        super().__init__()
+        self.listener = None
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        if self.listener:
+            self.listener()
+
+
 class StatusWindow(threading.Thread):
+    """
+    The status window, created once and shown for each recording.
+
+    The Tk window and its icons are built when the thread starts; afterwards the window is only
+    shown and hidden. Updates put on the status queue post a virtual event to the Tk loop, so
+    they are handled as soon as they arrive instead of on a polling timer.
+    """
+
     def __init__(self, status_queue):
-        threading.Thread.__init__(self)
+        threading.Thread.__init__(self, daemon=True)
         self.status_queue = status_queue
+        self.recording_thread = None
+        self.ready = threading.Event()
+        status_queue.listener = self.notify
 
-    def schedule_check(self, func):
-        if hasattr(self, "window"):
-            self.window.after(100, func)
+    def notify(self):
+        if self.ready.is_set():
+            # Safe from other threads: Tkinter hands the call to the Tk thread
+            self.window.event_generate("<<StatusChanged>>", when="tail")
 
     def handle_close_button(self):
-        if hasattr(self, "recording_thread"):
+        if self.recording_thread:
             self.recording_thread.stop()
         self.status_queue.put(("cancel", ""))
 
+    def load_icon(self, name):
+        image = Image.open(os.path.join("assets", name)).resize((32, 32), Image.LANCZOS)
+        return ImageTk.PhotoImage(image)
+
     def run(self):
         self.window = tk.Tk()
+        self.window.withdraw()
         self.window.title("Status")
         self.window.configure(bg="#B0C4DE")
         self.window.attributes("-topmost", 1)
@@ -48,14 +77,9 @@ class StatusWindow(threading.Thread):
         )
         self.label.place(x=140, y=40, anchor="center")
 
-        # Load and display the icons
-        self.microphone_image = Image.open(os.path.join("assets", "microphone.png"))
-        self.microphone_image = self.microphone_image.resize((32, 32), Image.ANTIALIAS)
-        self.microphone_photo = ImageTk.PhotoImage(self.microphone_image)
-
-        self.pencil_image = Image.open(os.path.join("assets", "pencil.png"))
-        self.pencil_image = self.pencil_image.resize((32, 32), Image.ANTIALIAS)
-        self.pencil_photo = ImageTk.PhotoImage(self.pencil_image)
+        # Load the icons once; every recording reuses them
+        self.microphone_photo = self.load_icon("microphone.png")
+        self.pencil_photo = self.load_icon("pencil.png")
 
         self.icon_label = tk.Label(
             self.window, image=self.microphone_photo, bg="#B0C4DE"
@@ -75,22 +99,24 @@ class StatusWindow(threading.Thread):
         )
         self.close_button.place(x=235, y=15, anchor="center")
 
+        self.window.bind("<<StatusChanged>>", self.process_queue)
+        self.ready.set()
+        # Handle anything queued while the window was being built
         self.process_queue()
         self.window.mainloop()
 
-    def process_queue(self):
-        try:
-            status, text = self.status_queue.get_nowait()
+    def process_queue(self, event=None):
+        while True:
+            try:
+                status, text = self.status_queue.get_nowait()
+            except queue.Empty:
+                return
             if status in ("idle", "error", "cancel"):
-                self.window.quit()
-                self.window.destroy()
-                gc.collect()
-            elif status == "recording" and hasattr(self, "window"):
+                self.window.withdraw()
+            elif status == "recording":
                 self.icon_label.config(image=self.microphone_photo)
                 self.label.config(text=text)
-            elif status == "transcribing" and hasattr(self, "window"):
+                self.window.deiconify()
+            elif status == "transcribing":
                 self.icon_label.config(image=self.pencil_photo)
                 self.label.config(text=text)
-            self.window.after(100, self.process_queue)
-        except queue.Empty:
-            self.window.after(100, self.process_queue)
@@ -0,0 +1,69 @@
+import queue
+import threading
+
+from loguru import logger
+
+
+class StreamingTranscriber:
+    """
+    Transcribes an utterance piece by piece while it is still being recorded.
+
+    The recording loop cuts the audio into chunks at VAD pauses and pushes each finished chunk
+    here. A background worker transcribes the chunks in order and commits their text, using the
+    text committed so far as the prompt for the next chunk. Committed chunks are never decoded
+    again; only the tail that is still being spoken is left for finish(), so the wait after the
+    user stops talking is roughly the cost of that last chunk.
+    """
+
+    # Whisper only looks at the end of the prompt, so there is no point sending all of it
+    max_prompt_chars = 200
+
+    def __init__(self, transcribe_chunk, initial_prompt=None):
+        # transcribe_chunk(audio_data, prompt) -> text, where audio_data is int16 samples
+        self.transcribe_chunk = transcribe_chunk
+        self.initial_prompt = initial_prompt or ""
+        self.committed = []
+        self.error = None
+        self._chunks = queue.Queue()
+        self._cancelled = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def push_chunk(self, audio_data):
+        self._chunks.put(audio_data)
+
+    def finish(self, tail=None):
+        """Transcribe the remaining tail, wait for all chunks and return the full text."""
+        if tail is not None and len(tail) > 0:
+            self._chunks.put(tail)
+        self._chunks.put(None)
+        self._thread.join()
+        if self.error:
+            raise self.error
+        return " ".join(self.committed)
+
+    def cancel(self):
+        self._cancelled = True
+        self._chunks.put(None)
+
+    def _prompt(self):
+        prompt = " ".join([self.initial_prompt, *self.committed]).strip()
+        return prompt[-self.max_prompt_chars :] or None
+
+    def _run(self):
+        while True:
+            audio_data = self._chunks.get()
+            if audio_data is None or self._cancelled:
+                return
+            # After a failure, drain the queue without decoding; finish() re-raises the error
+            if self.error:
+                continue
+            try:
+                text = self.transcribe_chunk(audio_data, self._prompt())
+            except Exception as e:
+                self.error = e
+                continue
+            text = text.strip() if text else ""
+            logger.debug(f"Committed chunk of {len(audio_data)} samples: {text}")
+            if text:
+                self.committed.append(text)
@@ -0,0 +1,145 @@
+"""
+Transcribe folders of audio files.
+
+Files are spread across a pool of worker processes, each with the engine's model loaded once,
+and every result is appended to a JSONL file as soon as it is ready. Running the same command
+again skips the files already in the output, so an interrupted run picks up where it stopped.
+Files are memory-mapped rather than read, and long ones are transcribed in overlapping windows
+with the segment timestamps stitched together, so memory use doesn't grow with their length.
+Run it from the repository root:
+
+    python src/transcribe_files.py recordings/ --output transcripts.jsonl --workers 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from benchmark import find_corpus
+from long_audio import read_wav_memmap, transcribe_long
+
+# Files longer than this are transcribed in overlapping windows with segment timestamps
+LONG_AUDIO_SECONDS = 60
+# Set in each worker process by init_worker
+worker_config = None
+
+
+def init_worker(config):
+    global worker_config
+    from engines import get_engine
+
+    worker_config = config
+    get_engine(config).preload()
+
+
+def transcribe_file(path):
+    from engines import get_engine
+    from transcription import transcribe_audio
+
+    start = time.perf_counter()
+    result = {"file": str(path)}
+    try:
+        # The file is mapped, not read, so a long recording doesn't have to fit in memory
+        samples, sample_rate = read_wav_memmap(path)
+        if sample_rate != 16000:
+            raise ValueError(f"expected 16 kHz audio, got {sample_rate} Hz")
+        if len(samples) > LONG_AUDIO_SECONDS * sample_rate:
+            segments = transcribe_long(get_engine(worker_config), samples, sample_rate)
+            result["segments"] = segments
+            text = "".join(text for _, _, text in segments)
+        else:
+            text = transcribe_audio(np.array(samples), sample_rate, worker_config)
+    except Exception as e:
+        return {**result, "error": f"{type(e).__name__}: {e}"}
+    return {
+        **result,
+        "audio_seconds": len(samples) / sample_rate,
+        "seconds": time.perf_counter() - start,
+        "text": text,
+    }
+
+
+def read_finished(output_path):
+    """
+    Files with a result in an earlier output file. A last line cut off by an interrupted run is
+    removed so new results start on a line of their own.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, "rb+") as output:
+        content = output.read()
+        complete = content.rfind(b"\n") + 1
+        if complete < len(content):
+            output.truncate(complete)
+
+    finished = set()
+    for line in content[:complete].splitlines():
+        result = json.loads(line)
+        if "error" not in result:
+            finished.add(result["file"])
+    return finished
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="WAV files or folders of WAV files")
+    parser.add_argument("--output", required=True, help="JSONL file to append results to")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument("--engine", help="engine[:model] to use (default: the configured engine)")
+    parser.add_argument("--config", help="JSON object of config values to override")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    from config import load_tool_config
+
+    # The workers create the API client before anything else loads .env, and inherit the
+    # environment from this process
+    load_dotenv()
+    config = load_tool_config(json.loads(args.config) if args.config else {}, args.engine)
+    config["print_to_terminal"] = False
+    # Each worker already is a process of its own
+    config["inference_workers"]["processes"] = 0
+
+    finished = read_finished(args.output)
+    files = [path for path in find_corpus(args.paths) if str(path) not in finished]
+    print(f"{len(files)} files to transcribe, {len(finished)} already done", file=sys.stderr)
+
+    start = time.perf_counter()
+    audio_seconds = 0.0
+    errors = 0
+    with open(args.output, "a", encoding="utf-8") as output, ProcessPoolExecutor(
+        args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(config,),
+    ) as pool:
+        futures = [pool.submit(transcribe_file, path) for path in files]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            if "error" in result:
+                errors += 1
+                print(f"{result['file']}: {result['error']}", file=sys.stderr)
+            else:
+                audio_seconds += result["audio_seconds"]
+            print(f"\r{done}/{len(files)} files", end="", file=sys.stderr)
+
+    wall_seconds = time.perf_counter() - start
+    print(
+        f"\nTranscribed {audio_seconds / 3600:.2f} hours of audio in {wall_seconds / 3600:.2f} "
+        f"hours ({audio_seconds / wall_seconds if wall_seconds else 0:.1f} audio hours per hour)"
+        f", {errors} errors",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,31 @@
-import os
+import contextlib
 import tempfile
+import time
 import traceback
-import wave
-from pathlib import Path
-
-import numpy as np
-import openai
-import sounddevice as sd
-import webrtcvad
-import whisper
+
 from dotenv import load_dotenv
-from faster_whisper import WhisperModel
 from loguru import logger
 
-if load_dotenv():
-    openai.api_key = os.getenv("OPENAI_API_KEY")
+from capture import (
+    RingBuffer,
+    SampleBuffer,
+    device_sample_rate,
+    get_capture_service,
+    stream_options,
+)
+from engines import encode_wav, get_engine
+from journal import get_journal
+from metrics import SessionTimer
+from result_cache import get_result_cache
+from scheduler import get_scheduler, scheduled_config
+from streaming import StreamingTranscriber
+from vad import FrameClassifier, load_webrtcvad
+from workers import get_inference_pool
+
+# The transcription engines import their backends on first use (see preload_backend), so an
+# API-only setup never pays for importing torch. The API client reads OPENAI_API_KEY from the
+# environment when it is created, so loading .env here is enough.
+load_dotenv()
 
 
 def process_transcription(transcription, config=None):
@@ -32,138 +43,259 @@ def process_transcription(transcription, config=None):
 """
 Record audio from the microphone and transcribe it using the OpenAI API.
 Recording stops when the user stops speaking.
+input_stream replaces sd.InputStream, e.g. to replay a file in the benchmarks.
+session is a SessionTimer that gets a timestamp for each stage of the recording.
 """
 
 
-def record_and_transcribe(status_queue, cancel_flag, config=None):
+def record_and_transcribe(
+    status_queue, cancel_flag, config=None, input_stream=None, session=None
+):
     sample_rate = 16000
     frame_duration = 30  # 30ms, supported values: 10, 20, 30
     buffer_duration = 300  # 300ms
     silence_duration = config["silence_duration"] if config else 900  # 900ms
 
-    vad = webrtcvad.Vad(3)  # Aggressiveness mode: 3 (highest)
-    buffer = []
-    recording = []
+    session = session or SessionTimer()
+    journal = get_journal(config)
+    classifier = FrameClassifier.from_config(config, sample_rate)
+    frame_size = sample_rate * frame_duration // 1000
+    recording = SampleBuffer()
+    # Whether any speech has been heard; in streaming mode the recording can be empty after it
+    speech_detected = False
     num_silent_frames = 0
     num_buffer_frames = buffer_duration // frame_duration
     silence_frames_threshold = silence_duration // frame_duration
+
+    streaming_options = (config.get("streaming") if config else None) or {}
+    streamer = None
+    # Start of the part of the recording that has not been handed to the streamer yet
+    chunk_start = 0
+    # The engines that produced the text, for the journal; the scheduler can pick one per chunk
+    engines_used = []
+
+    def transcribe(audio_data, prompt=None):
+        text, engine = transcribe_with_engine(audio_data, sample_rate, config, prompt)
+        engines_used.append(engine)
+        return text
+
     try:
+        if streaming_options.get("enabled"):
+            streamer = StreamingTranscriber(
+                transcribe, initial_prompt=get_engine(config).initial_prompt
+            )
+            pause_frames_threshold = streaming_options.get("pause_duration", 300) // frame_duration
+            min_chunk_size = streaming_options.get("min_chunk_duration", 2000) * sample_rate // 1000
         print("Recording...") if config["print_to_terminal"] else ""
-        with sd.InputStream(
-            samplerate=sample_rate,
-            channels=1,
-            dtype="int16",
-            blocksize=sample_rate * frame_duration // 1000,
-            callback=lambda indata, frames, time, status: buffer.extend(indata[:, 0]),
-        ):
-            while not cancel_flag():
-                logger.debug("Continuing recording")
-                if len(buffer) < sample_rate * frame_duration // 1000:
-                    logger.debug("Buffer not full")
+        buffer, stream = open_capture(config, sample_rate, frame_size, input_stream)
+        with stream:
+            session.mark("stream_opened")
+            endpoint_detected = False
+            while not endpoint_detected and not cancel_flag():
+                # Wake up periodically so a cancel request is noticed without audio arriving.
+                # If the loop fell behind, every frame that has piled up is classified at once.
+                frames = buffer.read_frames(frame_size, num_buffer_frames, timeout=0.1)
+                if frames is None:
                     continue
 
-                frame = buffer[: sample_rate * frame_duration // 1000]
-                buffer = buffer[sample_rate * frame_duration // 1000 :]
-
-                is_speech = vad.is_speech(np.array(frame).tobytes(), sample_rate)
-                if is_speech:
-                    logger.debug("Speech detected")
-                    recording.extend(frame)
-                    num_silent_frames = 0
-                else:
-                    logger.debug("Silence detected")
-                    if len(recording) > 0:
+                for frame, is_speech in zip(frames, classifier.classify(frames)):
+                    if is_speech:
+                        session.mark("first_speech")
+                        recording.extend(frame)
+                        speech_detected = True
+                        num_silent_frames = 0
+                        continue
+
+                    if speech_detected:
                         num_silent_frames += 1
 
                     if num_silent_frames >= silence_frames_threshold:
+                        endpoint_detected = True
                         break
 
+                    # A short pause ends a chunk that can be transcribed while recording continues
+                    if (
+                        streamer
+                        and num_silent_frames == pause_frames_threshold
+                        and len(recording) - chunk_start >= min_chunk_size
+                    ):
+                        streamer.push_chunk(recording.view()[chunk_start:].copy())
+                        chunk_start = len(recording)
+                        if not (config.get("save_debug_audio") or journal):
+                            # Only the audio since the last chunk is kept, so an open-ended
+                            # dictation doesn't grow the recording without bound
+                            recording.drop_front(chunk_start)
+                            chunk_start = 0
+            session.mark("endpoint")
+
+        logger.debug(
+            f"VAD: {classifier.gated_frames} frames decided by energy, "
+            f"{classifier.vad_frames} by webrtcvad"
+        )
+        if buffer.overruns:
+            logger.warning(f"Dropped {buffer.overruns} samples while recording")
+
         # TODO: is this used?
         if cancel_flag():
+            if streamer:
+                streamer.cancel()
             status_queue.put(("cancel", ""))
             return ""
 
-        audio_data = np.array(recording, dtype=np.int16)
+        audio_data = recording.view()
         print("Recording finished. Size:", audio_data.size) if config[
             "print_to_terminal"
         ] else ""
 
-        # Save the recorded audio as a temporary WAV file on disk
-        with tempfile.NamedTemporaryFile(
-            suffix=".wav", delete=False
-        ) as temp_audio_file:
-            with wave.open(temp_audio_file.name, "wb") as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)  # 2 bytes (16 bits) per sample
-                wf.setframerate(sample_rate)
-                wf.writeframes(audio_data.tobytes())
+        # Only write the recording to disk when asked to, so it can be inspected afterwards
+        if config.get("save_debug_audio"):
+            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio_file:
+                temp_audio_file.write(encode_wav(audio_data, sample_rate).getvalue())
+            logger.debug(f"Saved recording to {temp_audio_file.name}")
 
+        session.mark("audio_encoded")
         status_queue.put(("transcribing", "Transcribing..."))
-        print("Transcribing audio file...") if config["print_to_terminal"] else ""
-
-        # If configured, transcribe the temporary audio file using the OpenAI API
-        if config["use_api"]:
-            api_options = config["api_options"]
-            with open(temp_audio_file.name, "rb") as audio_file:
-                response = openai.Audio.transcribe(
-                    model=api_options["model"],
-                    file=audio_file,
-                    language=api_options["language"],
-                    prompt=api_options["initial_prompt"],
-                    temperature=api_options["temperature"],
-                )
-        else:
-            # TODO: does this work? the array is using int16
-            fw(audio_data)
-            model_options = config["local_model_options"]
-            model = whisper.load_model(
-                name=model_options["model"], device=model_options["device"]
-            )
-            response = model.transcribe(
-                audio=temp_audio_file.name,
-                language=model_options["language"],
-                verbose=None
-                if not config["print_to_terminal"]
-                else model_options["verbose"],
-                initial_prompt=model_options["initial_prompt"],
-                condition_on_previous_text=model_options["condition_on_previous_text"],
-                temperature=model_options["temperature"],
-            )
+        print("Transcribing audio...") if config["print_to_terminal"] else ""
 
-        # Remove the temporary audio file
-        os.remove(temp_audio_file.name)
+        session.mark("inference_start")
+        if streamer:
+            # Earlier chunks are already transcribed; only the tail is left
+            result = streamer.finish(audio_data[chunk_start:])
+        else:
+            result = transcribe(audio_data)
+        session.mark("inference_end")
 
         if cancel_flag():
             status_queue.put(("cancel", ""))
             return ""
 
-        result = response.get("text")
         print("Transcription:", result) if config["print_to_terminal"] else ""
         status_queue.put(("idle", ""))
 
+        if journal:
+            record_utterance(journal, audio_data, sample_rate, result, engines_used, session)
+
         return process_transcription(result.strip(), config) if result else ""
 
-    except Exception as e:
+    except Exception:
+        if streamer:
+            streamer.cancel()
         traceback.print_exc()
         status_queue.put(("error", "Error"))
 
 
-def fw(waveform: np.ndarray):
-    # model_size_or_path: Size of the model to use (tiny, tiny.en, base, base.en,
-    #  small, small.en, medium, medium.en, large-v1, large-v2, or large), a path to a converted
-    #  model directory, or a CTranslate2-converted Whisper model ID from the Hugging Face Hub.
-    #  When a size or a model ID is configured, the converted model is downloaded
-    #  from the Hugging Face Hub.
-    model_size = "small.en"
-    # or run on CPU with INT8
-    model = WhisperModel(model_size, device="cpu", compute_type="int8")
+def record_utterance(journal, audio_data, sample_rate, text, engines, session):
+    """
+    Queue a finished dictation for the journal. It is written on the journal's own thread, so
+    the text is typed without waiting for the disk.
+    """
+    journal.append_later(
+        audio_data,
+        sample_rate,
+        engine=engines[-1].name,
+        # Streamed chunks can each have been transcribed by a different model
+        model=",".join(dict.fromkeys(engine.model_name for engine in engines)),
+        latency=session.marks["inference_end"] - session.marks["endpoint"],
+        text=text or "",
+    )
+
+
+def open_capture(config, sample_rate, frame_size, input_stream=None):
+    """
+    Return the ring buffer the recording is read from and a context manager that keeps audio
+    flowing into it: a new input stream, or nothing if the persistent capture service is used.
+    """
+    capture_options = (config.get("capture") if config else None) or {}
+    if input_stream is None and capture_options.get("persistent_stream"):
+        service = get_capture_service(
+            sample_rate, frame_size, capture_options.get("device_sample_rate")
+        )
+        preroll = capture_options.get("preroll_duration", 300) * sample_rate // 1000
+        return service.open_session(preroll), contextlib.nullcontext()
+
+    # Two seconds of headroom in case the VAD loop falls behind the audio callback
+    buffer = RingBuffer(sample_rate * 2)
+    if input_stream is not None:
+        # Stand-ins such as the benchmark's replay stream deliver audio at sample_rate
+        return buffer, input_stream(**stream_options(buffer, sample_rate, frame_size, sample_rate))
+
+    # Imported here so the benchmarks can run on machines without PortAudio
+    import sounddevice as sd
+
+    device_rate = device_sample_rate(capture_options.get("device_sample_rate"))
+    stream = sd.InputStream(**stream_options(buffer, sample_rate, frame_size, device_rate))
+    return buffer, stream
 
-    segments, info = model.transcribe(waveform, language="en", vad_filter=True)
 
-    print(
-        "Detected language '%s' with probability %f"
-        % (info.language, info.language_probability)
+def preload_backend(config):
+    """
+    Import the VAD and the configured engine and load its model, and open the persistent input
+    stream if it is enabled, so the first dictation doesn't pay for it.
+    """
+    load_webrtcvad()
+    if config["inference_workers"]["processes"]:
+        # The workers load the model themselves; this process never imports the backend
+        get_inference_pool(config)
+    else:
+        scheduler = get_scheduler(config)
+        if scheduler and hasattr(get_engine(config), "load_model"):
+            # The scheduler prefers models that are already loaded. Only as many as the model
+            # cache keeps are loaded, fastest first, or the later ones would evict the earlier.
+            options_key = get_engine(config).options_key
+            for model in scheduler.models[: config["model_cache"]["max_resident"]]:
+                options = {**config[options_key], "model": model}
+                get_engine({**config, options_key: options}).preload()
+        else:
+            get_engine(config).preload()
+    if (config.get("capture") or {}).get("persistent_stream"):
+        get_capture_service(16000, 480, config["capture"]["device_sample_rate"]).start()
+
+
+def transcribe_audio(audio_data, sample_rate, config, prompt=None):
+    """
+    Transcribe int16 samples with the configured engine and return the text. prompt overrides
+    the configured initial prompt. With inference workers enabled the samples are transcribed in
+    a worker process. With the result cache enabled, audio transcribed before isn't sent again.
+    """
+    return transcribe_with_engine(audio_data, sample_rate, config, prompt)[0]
+
+
+def transcribe_with_engine(audio_data, sample_rate, config, prompt=None):
+    """
+    Like transcribe_audio, but return the engine that produced the text along with it, which
+    has the model the scheduler picked rather than the configured one.
+    """
+    scheduler = get_scheduler(config)
+    engine = get_engine(config)
+    scheduled = (
+        not config["inference_workers"]["processes"]
+        and scheduler
+        and hasattr(engine, "load_model")
     )
+    if scheduled:
+        # Local engines pick the model that fits the latency budget for this utterance
+        audio_seconds = len(audio_data) / sample_rate
+        engine = get_engine(scheduled_config(config, scheduler, audio_seconds))
+
+    cache = get_result_cache(config)
+    if cache:
+        # Keyed on the engine that runs, so text from one model is never served for another
+        key = cache.key(audio_data, sample_rate, engine, prompt)
+        text = cache.get(key)
+        if text is not None:
+            logger.debug(f"Result cache hit for {key}")
+            return text, engine
 
-    for segment in segments:
-        print("[%.2fs -> %.2fs] %s" % (segment.start, segment.end, segment.text))
+    if config["inference_workers"]["processes"]:
+        text = get_inference_pool(config).transcribe(audio_data, sample_rate, prompt)
+    elif scheduled:
+        # Loading the model is not part of its speed
+        engine.preload()
+        start = time.perf_counter()
+        text = engine.transcribe(audio_data, sample_rate, prompt)
+        scheduler.observe(engine.model_name, audio_seconds, time.perf_counter() - start)
+    else:
+        text = engine.transcribe(audio_data, sample_rate, prompt)
+    if cache:
+        cache.put(key, text)
+    return text, engine
@@ -0,0 +1,63 @@
+import numpy as np
+
+
+def load_webrtcvad():
+    """
+    Import webrtcvad on first use. Importing it loads pkg_resources, which takes long enough to
+    hold up registering the hotkey, so preload_backend imports it in the background instead.
+    """
+    import webrtcvad
+
+    return webrtcvad
+
+
+class FrameClassifier:
+    """
+    Decides which 30ms frames contain speech, a whole block of frames at a time.
+
+    Frame energy (RMS) and zero-crossing rate are computed for the block in NumPy. Frames that
+    are clearly silent, or clearly loud voiced sound, are decided from those alone; only frames
+    near the decision boundary are passed to webrtcvad.
+    """
+
+    def __init__(
+        self,
+        sample_rate=16000,
+        aggressiveness=3,
+        silence_threshold=150,
+        speech_threshold=3000,
+        max_zero_crossing_rate=0.25,
+    ):
+        self.sample_rate = sample_rate
+        self.vad = load_webrtcvad().Vad(aggressiveness)
+        # RMS of int16 samples; 150 is about -47 dBFS and 3000 about -21 dBFS
+        self.silence_threshold = silence_threshold
+        self.speech_threshold = speech_threshold
+        # Voiced speech crosses zero far less often than hiss or clicks at the same energy
+        self.max_zero_crossing_rate = max_zero_crossing_rate
+
+        self.gated_frames = 0
+        self.vad_frames = 0
+
+    @classmethod
+    def from_config(cls, config, sample_rate=16000):
+        options = (config.get("vad_options") if config else None) or {}
+        return cls(sample_rate=sample_rate, **options)
+
+    def classify(self, frames):
+        """Return a bool array saying which rows of a (frames, frame_size) array are speech."""
+        samples = frames.astype(np.float32)
+        rms = np.sqrt(np.mean(samples * samples, axis=1))
+        signs = np.signbit(frames)
+        zero_crossing_rate = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        is_speech = (rms >= self.speech_threshold) & (
+            zero_crossing_rate <= self.max_zero_crossing_rate
+        )
+        undecided = np.flatnonzero((rms >= self.silence_threshold) & ~is_speech)
+        for i in undecided:
+            is_speech[i] = self.vad.is_speech(frames[i].tobytes(), self.sample_rate)
+
+        self.vad_frames += len(undecided)
+        self.gated_frames += len(frames) - len(undecided)
+        return is_speech
@@ -0,0 +1,284 @@
+import atexit
+import collections
+import itertools
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+from loguru import logger
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+def _read_audio(descriptor):
+    """Copy-free view of the samples a descriptor points to, and the shared block to close after."""
+    name, offset, length, _, _ = descriptor
+    block = shared_memory.SharedMemory(name=name)
+    return np.ndarray((length,), dtype=np.int16, buffer=block.buf, offset=offset), block
+
+
+def _worker_main(worker_id, config, tasks, results):
+    """Worker process entry point: load the engine once, then transcribe tasks until stopped."""
+    from engines import get_engine
+
+    engine = get_engine(config)
+    engine.preload()
+    results.put(("ready", worker_id, None, None))
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        task_id, descriptor, prompt = task
+        audio_data = block = None
+        try:
+            # A block that can't be opened fails this task instead of the worker
+            audio_data, block = _read_audio(descriptor)
+            text = engine.transcribe(audio_data, descriptor[3], prompt)
+            results.put(("done", worker_id, task_id, text))
+        except Exception as e:
+            logger.exception(f"Transcription failed for session {descriptor[4]}")
+            results.put(("error", worker_id, task_id, f"{type(e).__name__}: {e}"))
+        finally:
+            # The view must go before the mapping can be closed
+            del audio_data
+            if block is not None:
+                block.close()
+
+
+class AudioSlots:
+    """
+    Shared memory blocks that carry utterances to the worker processes.
+
+    The samples are copied into a block once and the worker reads them in place, so only a small
+    descriptor (block name, offset, length, sample rate, session ID) goes through the task queue.
+    A block is reused for the next utterance that fits once its worker has finished; up to
+    max_free idle blocks are kept, the rest are unlinked.
+    """
+
+    def __init__(self, slot_samples=30 * 16000, max_free=4):
+        self.slot_bytes = slot_samples * np.dtype(np.int16).itemsize
+        self.max_free = max_free
+        self._free = []
+        self._busy = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, audio_data, sample_rate, session_id=None):
+        """Copy int16 samples into a free block and return their descriptor."""
+        nbytes = audio_data.nbytes
+        with self._lock:
+            fits = [block for block in self._free if block.size >= nbytes]
+            if fits:
+                block = min(fits, key=lambda b: b.size)
+                self._free.remove(block)
+            else:
+                # Round up to whole slots so a block can be reused for similar lengths
+                slots = max(1, -(-nbytes // self.slot_bytes))
+                block = shared_memory.SharedMemory(create=True, size=slots * self.slot_bytes)
+            self._busy[block.name] = block
+        np.ndarray(audio_data.shape, dtype=np.int16, buffer=block.buf)[:] = audio_data
+        return (block.name, 0, len(audio_data), sample_rate, session_id)
+
+    def release(self, descriptor):
+        with self._lock:
+            block = self._busy.pop(descriptor[0])
+            self._free.append(block)
+            while len(self._free) > self.max_free:
+                self._destroy(self._free.pop(0))
+
+    def close(self):
+        with self._lock:
+            for block in [*self._free, *self._busy.values()]:
+                self._destroy(block)
+            self._free.clear()
+            self._busy.clear()
+
+    @staticmethod
+    def _destroy(block):
+        block.close()
+        block.unlink()
+
+
+class Worker:
+    def __init__(self, worker_id, context, config, results):
+        self.id = worker_id
+        self.tasks = context.Queue()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(worker_id, config, self.tasks, results),
+            name=f"inference-worker-{worker_id}",
+            daemon=True,
+        )
+        self.process.start()
+        self.ready = False
+        # (task_id, task) being transcribed, so it can be retried if the process dies
+        self.current = None
+
+
+class InferencePool:
+    """
+    Runs the transcription engine in separate worker processes, each with its model loaded once.
+
+    Keeping inference out of the hotkey process means model code never holds the GIL that the
+    audio callback, the VAD loop and the status window need. A worker that dies is replaced, and
+    the utterance it was working on is retried once on another worker. Samples reach the workers
+    through AudioSlots rather than being pickled through the task queue.
+    """
+
+    max_attempts = 2
+    # Workers that keep dying before their model loads will not start on the next try either
+    max_startup_failures = 3
+
+    def __init__(self, config, num_workers=1):
+        self.config = config
+        # spawn gives each worker a clean interpreter instead of a fork of a threaded process
+        self._context = multiprocessing.get_context("spawn")
+        self._results = self._context.Queue()
+        self.slots = AudioSlots(max_free=2 * num_workers)
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        self._futures = {}
+        self._attempts = {}
+        self._descriptors = {}
+        self._task_ids = itertools.count()
+        self._worker_ids = itertools.count()
+        self._closed = False
+
+        self.workers = [self._start_worker() for _ in range(num_workers)]
+        self.restarts = 0
+        self._startup_failures = 0
+        self._broken = None
+        self._manager = threading.Thread(target=self._manage, daemon=True)
+        self._manager.start()
+        atexit.register(self.close)
+
+    def submit(self, audio_data, sample_rate=16000, prompt=None, session_id=None):
+        """Queue int16 samples for transcription and return a Future for the text."""
+        future = Future()
+        with self._lock:
+            if self._broken:
+                raise WorkerCrashed(self._broken)
+        descriptor = self.slots.acquire(audio_data, sample_rate, session_id)
+        with self._lock:
+            task_id = next(self._task_ids)
+            self._futures[task_id] = future
+            self._attempts[task_id] = 0
+            self._descriptors[task_id] = descriptor
+            self._pending.append((task_id, (task_id, descriptor, prompt)))
+            self._dispatch()
+        return future
+
+    def transcribe(self, audio_data, sample_rate=16000, prompt=None, session_id=None):
+        return self.submit(audio_data, sample_rate, prompt, session_id).result()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for worker in self.workers:
+                worker.tasks.put(None)
+        for worker in self.workers:
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self.slots.close()
+
+    def _start_worker(self):
+        return Worker(next(self._worker_ids), self._context, self.config, self._results)
+
+    def _dispatch(self):
+        # Caller holds self._lock
+        for worker in self.workers:
+            if not self._pending:
+                return
+            if worker.ready and worker.current is None:
+                worker.current = self._pending.popleft()
+                self._attempts[worker.current[0]] += 1
+                worker.tasks.put(worker.current[1])
+
+    def _manage(self):
+        while not self._closed:
+            self._replace_dead_workers()
+            try:
+                kind, worker_id, task_id, value = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            with self._lock:
+                worker = next((w for w in self.workers if w.id == worker_id), None)
+                if worker is not None:
+                    self._startup_failures = 0
+                    worker.ready = True
+                    worker.current = None
+                # A worker can die after posting its result, so the task may have been queued
+                # for a retry as well. The first result wins and later ones are ignored.
+                future = self._futures.pop(task_id, None)
+                if future is not None:
+                    self._pending = collections.deque(
+                        task for task in self._pending if task[0] != task_id
+                    )
+                    self._finish(task_id)
+                    if kind == "done":
+                        future.set_result(value)
+                    else:
+                        future.set_exception(RuntimeError(value))
+                self._dispatch()
+
+    def _replace_dead_workers(self):
+        with self._lock:
+            for i, worker in enumerate(self.workers):
+                if self._closed or self._broken or worker.process.is_alive():
+                    continue
+                logger.warning(
+                    f"Inference worker {worker.id} exited with code {worker.process.exitcode}"
+                )
+                if worker.current is not None and worker.current[0] in self._futures:
+                    task_id = worker.current[0]
+                    if self._attempts[task_id] < self.max_attempts:
+                        self._pending.appendleft(worker.current)
+                    else:
+                        self._finish(task_id)
+                        self._futures.pop(task_id).set_exception(
+                            WorkerCrashed("An inference worker crashed transcribing this audio")
+                        )
+                if not worker.ready:
+                    self._startup_failures += 1
+                if self._startup_failures >= self.max_startup_failures:
+                    self._fail_all("Inference workers exit before loading the model; see their log")
+                    return
+                self.workers[i] = self._start_worker()
+                self.restarts += 1
+            self._dispatch()
+
+    def _finish(self, task_id):
+        # Caller holds self._lock
+        del self._attempts[task_id]
+        self.slots.release(self._descriptors.pop(task_id))
+
+    def _fail_all(self, reason):
+        # Caller holds self._lock
+        self._broken = reason
+        logger.error(reason)
+        for task_id, future in self._futures.items():
+            future.set_exception(WorkerCrashed(reason))
+            self._finish(task_id)
+        self._futures.clear()
+        self._pending.clear()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_inference_pool(config):
+    """The process-wide pool, started on first use with the configured number of processes."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = InferencePool(config, config["inference_workers"]["processes"])
+        return _pool